@@ -1,7 +1,11 @@
 import math
+import threading
+import weakref
+from array import array
 from itertools import permutations
 from collections import deque
-from structures import MinHeap
+from structures import MinHeap, SnapPoint
+from graph_snapshot import FLAG_DRIVE, FLAG_WALK
 
 METERS_PER_DEG_LAT = 111000
 METERS_PER_DEG_LON = 93000
@@ -17,14 +21,6 @@ def get_distance_meters(node_a, node_b):
     d_lon = (node_a['lon'] - node_b['lon']) * METERS_PER_DEG_LON
     return math.sqrt(d_lat**2 + d_lon**2)
 
-def heuristic_time(node_a, node_b, mode='car'):
-    """Heuristic function for A* - estimated time to reach goal."""
-    dist = get_distance_meters(node_a, node_b)
-    if mode == 'car':
-        return dist / MAX_CAR_SPEED
-    else:
-        return dist / MAX_WALK_SPEED
-
 def get_tobler_time(dist, elev_diff):
     """Tobler's Hiking Function for walking speed based on slope."""
     if dist == 0:
@@ -34,19 +30,215 @@ def get_tobler_time(dist, elev_diff):
     speed_ms = speed_kmh / 3.6
     return dist / speed_ms
 
-def reconstruct_path(came_from, current):
-    """Reconstruct path from A* search result."""
-    total_path = [current]
-    while current in came_from and came_from[current] is not None:
-        current = came_from[current]
-        total_path.append(current)
+#  EDGE COST TABLES 
+# Car speeds in m/s by OSM highway type
+CAR_SPEED_PROFILE = {
+    'motorway': 25.0,       
+    'motorway_link': 19.4,  
+    'trunk': 19.4,          
+    'trunk_link': 16.7,     
+    'primary': 13.9,        
+    'primary_link': 11.1,   
+    'secondary': 11.1,      
+    'secondary_link': 9.7,  
+    'tertiary': 9.7,        
+    'tertiary_link': 8.3,  
+    'residential': 8.3,     
+    'living_street': 5.6,   
+    'service': 5.6,         
+    'unclassified': 8.3,    
+}
+DEFAULT_CAR_SPEED = 8.3
+INF = float('inf')
+
+def traffic_profile(graph):
+    """Name of the traffic profile currently applied to graph."""
+    return 'rush' if getattr(graph, 'rush_hour_active', False) else 'normal'
+
+def car_edge_time(dist, ele_diff, highway_type, rush_hour=False):
+    """Driving time in seconds for one edge, with rush hour, slope and intersection delays."""
+    base_speed = CAR_SPEED_PROFILE.get(highway_type, DEFAULT_CAR_SPEED)
+    
+    # Apply rush hour penalty if active
+    if rush_hour:
+        rush_multiplier = RUSH_HOUR_MULTIPLIERS.get(highway_type, 1.0)
+        base_speed = base_speed / rush_multiplier  # Slower speed
+    
+    # Slope adjustment (mild effect)
+    slope = ele_diff / dist if dist > 0 else 0
+    if slope > 0.05:
+        speed = base_speed * 0.92  # Slight uphill penalty
+    elif slope < -0.05:
+        speed = base_speed * 1.03  # Slight downhill boost
+    else:
+        speed = base_speed
+    
+    # Intersection delay - only on roads likely to have traffic lights
+    # Much reduced: ~2 sec per 500m on major roads only
+    if highway_type in ['primary', 'secondary', 'trunk']:
+        if rush_hour:
+            intersection_delay = (dist / 500) * 4  # 4 sec per 500m during rush
+        else:
+            intersection_delay = (dist / 500) * 2  # 2 sec per 500m normal
+    else:
+        intersection_delay = 0
+    
+    return (dist / speed) + intersection_delay
+
+def _edge_cost(graph, u, e, mode, rush_hour):
+    """Travel time of CSR edge e (leaving dense node u) in mode, inf if unusable."""
+    dist = graph.csr_weights[e]
+    if dist == INF:
+        return INF
+    mode_flag = FLAG_DRIVE if mode == 'car' else FLAG_WALK if mode == 'walk' else 0
+    if mode_flag and not graph.csr_flags[e] & mode_flag:
+        return INF
+    
+    ele_diff = graph.ele[graph.csr_targets[e]] - graph.ele[u]
+    if mode == 'walk':
+        return get_tobler_time(dist, ele_diff)
+    return car_edge_time(dist, ele_diff, graph.highway_names[graph.csr_highway[e]], rush_hour)
+
+def build_edge_costs(graph, mode, profile='normal'):
+    """Travel time of every CSR edge for one (mode, traffic profile) pair."""
+    rush_hour = profile == 'rush'
+    offsets = graph.csr_offsets
+    costs = array('d', bytes(8 * len(graph.csr_targets)))
+    for u in range(len(graph.node_ids)):
+        for e in range(offsets[u], offsets[u + 1]):
+            costs[e] = _edge_cost(graph, u, e, mode, rush_hour)
+    return costs
+
+def get_edge_costs(graph, mode, profile=None):
+    """
+    Cached per-edge cost table for (mode, traffic profile), built on first use.
+    Walking ignores traffic, so it has a single table. A table is rebuilt only
+    when CAR_SPEED_PROFILE or RUSH_HOUR_MULTIPLIERS have changed since it was built.
+    """
+    if profile is None:
+        profile = traffic_profile(graph)
+    key = (mode, 'normal' if mode == 'walk' else profile)
+    
+    cached = graph.cost_tables.get(key)
+    if cached is not None:
+        costs, speeds, multipliers = cached
+        if speeds == CAR_SPEED_PROFILE and multipliers == RUSH_HOUR_MULTIPLIERS:
+            return costs
+    
+    costs = build_edge_costs(graph, mode, key[1])
+    graph.cost_tables[key] = (costs, dict(CAR_SPEED_PROFILE), dict(RUSH_HOUR_MULTIPLIERS))
+    return costs
+
+def _reconstruct_osm_path(graph, parent, current):
+    """Follow a dense-index parent list (-1 = none) back to the source, as OSM ids."""
+    node_ids = graph.node_ids
+    total_path = [node_ids[current]]
+    while parent[current] != -1:
+        current = parent[current]
+        total_path.append(node_ids[current])
     return total_path[::-1]
 
+#  SEARCH CONTEXT 
+class SearchContext:
+    """
+    Reusable per-graph search state (distances, parents) sized once for all nodes.
+    Each search bumps a generation counter; an entry only counts as set when its
+    stamp equals the current generation, so starting a search is O(1) and a query
+    costs time proportional to the nodes it touches, not to the size of the city.
+    """
+    def __init__(self, n_nodes):
+        self.size = n_nodes
+        self.g_score = [float('inf')] * n_nodes
+        self.parent = [-1] * n_nodes
+        self.stamp = [0] * n_nodes
+        self.generation = 0
+    
+    def begin(self, source):
+        """Start a new search from dense index source and return its generation."""
+        self.generation += 1
+        self.g_score[source] = 0
+        self.parent[source] = -1
+        self.stamp[source] = self.generation
+        return self.generation
+
+_thread_state = threading.local()
+
+def get_search_context(graph, slot=0):
+    """
+    Reusable SearchContext for graph, one per thread so concurrent searches never share state.
+    Searches that need several independent states at once (e.g. bidirectional) use different slots.
+    """
+    contexts = getattr(_thread_state, 'contexts', None)
+    if contexts is None:
+        contexts = _thread_state.contexts = weakref.WeakKeyDictionary()
+    slots = contexts.setdefault(graph, {})
+    context = slots.get(slot)
+    if context is None or context.size != len(graph.node_ids):
+        context = slots[slot] = SearchContext(len(graph.node_ids))
+    return context
+
 #  A* SEARCH 
 
-def a_star_search(graph, start_id, end_id, mode='car', return_stats=False):
+def straight_line_heuristic(graph, source, goal, mode='car'):
+    """
+    Heuristic factory: returns estimate(i) = straight-line time from dense node i to goal.
+    Any callable with this signature can be passed to a_star_search as heuristic=.
+    """
+    lat, lon = graph.lat, graph.lon
+    max_speed = MAX_CAR_SPEED if mode == 'car' else MAX_WALK_SPEED
+    goal_lat, goal_lon = lat[goal], lon[goal]
+    
+    def estimate(i):
+        d_lat = (lat[i] - goal_lat) * METERS_PER_DEG_LAT
+        d_lon = (lon[i] - goal_lon) * METERS_PER_DEG_LON
+        return math.sqrt(d_lat**2 + d_lon**2) / max_speed
+    return estimate
+
+def _virtual_links(costs, point, outgoing):
+    """
+    Partial-edge links between a SnapPoint and the two ends of its road, with costs
+    in proportion to the length covered: [(dense node, cost)] from the point to
+    the node when outgoing, else from the node to the point. Closed directions are left out.
+    """
+    links = []
+    ahead, behind = 1 - point.fraction, point.fraction
+    forward = costs[point.edge]
+    backward = costs[point.twin] if point.twin != -1 else INF
+    if outgoing:
+        if forward != INF:
+            links.append((point.target, ahead * forward))
+        if backward != INF:
+            links.append((point.source, behind * backward))
+    else:
+        if forward != INF:
+            links.append((point.source, behind * forward))
+        if backward != INF:
+            links.append((point.target, ahead * backward))
+    return links
+
+def _same_road(graph, costs, start, goal):
+    """(cost, OSM path) for travelling straight along the road two SnapPoints share, else (inf, None)."""
+    if start.edge != goal.edge:
+        return INF, None
+    node_ids = graph.node_ids
+    if goal.fraction >= start.fraction and costs[start.edge] != INF:
+        return (goal.fraction - start.fraction) * costs[start.edge], [node_ids[start.source], node_ids[start.target]]
+    if goal.fraction < start.fraction and start.twin != -1 and costs[start.twin] != INF:
+        return (start.fraction - goal.fraction) * costs[start.twin], [node_ids[start.target], node_ids[start.source]]
+    return INF, None
+
+def a_star_search(graph, start_id, end_id, mode='car', return_stats=False, context=None, heuristic=None, queue=None):
     """
     A* pathfinding algorithm with topology awareness.
+    start_id / end_id may also be SnapPoints (CityGraph.snap_to_edge): the search
+    then starts / ends part way along an edge, and the cost covers the partial
+    edges while the path lists the road nodes in between.
+    context: optional SearchContext to reuse (defaults to this thread's context for graph).
+    heuristic: optional factory (graph, source, goal, mode) -> estimate(i); defaults to
+    graph.landmarks when loaded, else straight_line_heuristic.
+    queue: priority queue class for the open set; MinHeap by default, IndexedMinHeap
+    keeps each node queued at most once (decrease-key instead of duplicates),
+    RadixHeap buckets integer-millisecond keys (costs within 1 ms of optimal).
     Returns: (path, cost) or (path, cost, stats) if return_stats=True
     """
     import time
@@ -58,33 +250,72 @@ def a_star_search(graph, start_id, end_id, mode='car', return_stats=False):
             return None, float('inf'), {'algorithm_name': 'A*', 'nodes_explored': 0, 'heap_operations': 0, 'time_ms': 0}
         return None, float('inf')
     
-    if start_id not in graph.nodes or end_id not in graph.nodes:
+    # OSM ids are translated once here; the search itself runs on dense indices
+    virtual_start, virtual_goal = isinstance(start_id, SnapPoint), isinstance(end_id, SnapPoint)
+    start = start_id.source if virtual_start else graph.to_index(start_id)
+    goal = end_id.source if virtual_goal else graph.to_index(end_id)
+    if start is None or goal is None:
         if return_stats:
             return None, float('inf'), {'algorithm_name': 'A*', 'nodes_explored': 0, 'heap_operations': 0, 'time_ms': 0}
         return None, float('inf')
     
-    open_set = MinHeap()
-    open_set.push((0, start_id))
-    came_from = {}
+    offsets, targets = graph.csr_offsets, graph.csr_targets
+    costs = get_edge_costs(graph, mode)
     
-    g_score = {node_id: float('inf') for node_id in graph.nodes}
-    g_score[start_id] = 0
+    # Virtual endpoints: the search leaves from / arrives at both ends of the snapped road
+    sources = _virtual_links(costs, start_id, True) if virtual_start else [(start, 0)]
+    goal_links = dict(_virtual_links(costs, end_id, False)) if virtual_goal else {goal: 0}
+    best_cost, best_node, best_path = INF, -1, None
+    if virtual_start and virtual_goal:
+        best_cost, best_path = _same_road(graph, costs, start_id, end_id)
+    if not goal_links:
+        sources = []   # Goal road closed in this mode: only the same-road case can reach it
     
-    f_score = {node_id: float('inf') for node_id in graph.nodes}
-    f_score[start_id] = heuristic_time(graph.nodes[start_id], graph.nodes[end_id], mode)
+    # Landmark (ALT) bounds when the graph has them, straight-line otherwise
+    if heuristic is None:
+        heuristic = graph.landmarks or straight_line_heuristic
+    if virtual_goal:
+        # Lower bound to the point: the best of (bound to a road end + rest of the road)
+        search_from = sources[0][0] if sources else start
+        bounds = [(heuristic(graph, search_from, node, mode), link) for node, link in goal_links.items()]
+        if len(bounds) == 1:
+            (bound, link), = bounds
+            estimate = lambda i: bound(i) + link
+        else:
+            estimate = lambda i: min(bound(i) + link for bound, link in bounds)
+    else:
+        estimate = heuristic(graph, start, goal, mode)
+    
+    open_set = (queue or MinHeap)()
+    
+    # State lives in the reusable context; only touched nodes get stamped
+    context = context or get_search_context(graph)
+    generation = context.begin(sources[0][0] if sources else start)
+    g_score, came_from, stamp = context.g_score, context.parent, context.stamp
+    for node, cost in sources:
+        stamp[node] = generation
+        came_from[node] = -1
+        g_score[node] = cost
+        open_set.push((cost + estimate(node) if virtual_start else 0, node))
 
     nodes_explored = 0
-    heap_operations = 1  # Initial push
+    heap_operations = len(sources)  # Initial pushes
 
     while not open_set.is_empty():
-        current_f, current_id = open_set.pop()
+        current_f, current = open_set.pop()
         heap_operations += 1
+        
+        if virtual_goal:
+            if current_f >= best_cost:
+                break  # Nothing left in the queue can beat the best arrival found
+            if current in goal_links and g_score[current] + goal_links[current] < best_cost:
+                best_cost, best_node = g_score[current] + goal_links[current], current
         nodes_explored += 1
         
-        if current_id == end_id:
+        if current == goal and not virtual_goal:
             elapsed_ms = (time.time() - start_time) * 1000
-            path = reconstruct_path(came_from, current_id)
-            cost = g_score[end_id]
+            path = _reconstruct_osm_path(graph, came_from, current)
+            cost = g_score[goal]
             
             if return_stats:
                 stats = {
@@ -96,94 +327,172 @@ def a_star_search(graph, start_id, end_id, mode='car', return_stats=False):
                 return path, cost, stats
             return path, cost
 
-        neighbors = graph.get_neighbors(current_id)
-        for neighbor_data in neighbors:
-            neighbor_id = neighbor_data[0]
-            dist = neighbor_data[1]
-            is_walk = neighbor_data[2]
-            is_drive = neighbor_data[3]
+        for e in range(offsets[current], offsets[current + 1]):
+            edge_cost = costs[e]
             
-            if dist == float('inf'):
+            # Blocked edges and edges closed to this mode are stored as inf
+            if edge_cost == INF:
                 continue
-
-            if mode == 'car' and not is_drive:
-                continue
-            if mode == 'walk' and not is_walk:
-                continue
-            
-            curr_node = graph.nodes[current_id]
-            neigh_node = graph.nodes[neighbor_id]
-            ele_diff = neigh_node.get('ele', 0) - curr_node.get('ele', 0)
             
-            if mode == 'walk':
-                edge_cost = get_tobler_time(dist, ele_diff)
-            else:
-                highway_type = neighbor_data[5] if len(neighbor_data) > 5 else ''
-                
-                speed_map = {
-                    'motorway': 25.0,       
-                    'motorway_link': 19.4,  
-                    'trunk': 19.4,          
-                    'trunk_link': 16.7,     
-                    'primary': 13.9,        
-                    'primary_link': 11.1,   
-                    'secondary': 11.1,      
-                    'secondary_link': 9.7,  
-                    'tertiary': 9.7,        
-                    'tertiary_link': 8.3,  
-                    'residential': 8.3,     
-                    'living_street': 5.6,   
-                    'service': 5.6,         
-                    'unclassified': 8.3,    
-                }
-                
-                base_speed = speed_map.get(highway_type, 8.3)  
-                
-                # Apply rush hour penalty if active
-                if getattr(graph, 'rush_hour_active', False):
-                    rush_multiplier = RUSH_HOUR_MULTIPLIERS.get(highway_type, 1.0)
-                    base_speed = base_speed / rush_multiplier  # Slower speed
-                
-                # Slope adjustment (mild effect)
-                slope = ele_diff / dist if dist > 0 else 0
-                if slope > 0.05:
-                    speed = base_speed * 0.92  # Slight uphill penalty
-                elif slope < -0.05:
-                    speed = base_speed * 1.03  # Slight downhill boost
-                else:
-                    speed = base_speed
-                
-                # Intersection delay - only on roads likely to have traffic lights
-                # Much reduced: ~2 sec per 500m on major roads only
-                if getattr(graph, 'rush_hour_active', False):
-                    if highway_type in ['primary', 'secondary', 'trunk']:
-                        intersection_delay = (dist / 500) * 4  # 4 sec per 500m during rush
-                    else:
-                        intersection_delay = 0
-                else:
-                    if highway_type in ['primary', 'secondary', 'trunk']:
-                        intersection_delay = (dist / 500) * 2  # 2 sec per 500m normal
-                    else:
-                        intersection_delay = 0
-                
-                edge_cost = (dist / speed) + intersection_delay
-            
-            tentative_g = g_score[current_id] + edge_cost
-
-            if tentative_g < g_score[neighbor_id]:
-                came_from[neighbor_id] = current_id
-                g_score[neighbor_id] = tentative_g
-                f = tentative_g + heuristic_time(graph.nodes[neighbor_id], graph.nodes[end_id], mode)
-                f_score[neighbor_id] = f
-                open_set.push((f, neighbor_id))
+            neighbor = targets[e]
+            tentative_g = g_score[current] + edge_cost
+
+            if stamp[neighbor] != generation or tentative_g < g_score[neighbor]:
+                stamp[neighbor] = generation
+                came_from[neighbor] = current
+                g_score[neighbor] = tentative_g
+                f = tentative_g + estimate(neighbor)
+                open_set.push((f, neighbor))
                 heap_operations += 1
 
+    if best_cost != INF:
+        # Virtual goal reached (or start and goal on the same stretch of road)
+        path = best_path if best_node == -1 else _reconstruct_osm_path(graph, came_from, best_node)
+        if return_stats:
+            stats = {
+                'algorithm_name': 'A* Search',
+                'nodes_explored': nodes_explored,
+                'heap_operations': heap_operations,
+                'time_ms': (time.time() - start_time) * 1000
+            }
+            return path, best_cost, stats
+        return path, best_cost
+
     if return_stats:
         return None, float('inf'), {'algorithm_name': 'A*', 'nodes_explored': nodes_explored, 'heap_operations': heap_operations, 'time_ms': 0}
     return None, float('inf')
 
 
 
+#  BIDIRECTIONAL A* 
+def bidirectional_a_star(graph, start_id, end_id, mode='car', return_stats=False, queue=None):
+    """
+    Bidirectional A*: a forward search from the start over outgoing edges and a
+    backward search from the goal over incoming edges, meeting in the middle.
+    Both use the average potential p(v) = (h_goal(v) - h_start(v)) / 2 (negated for
+    the backward side), which keeps the two searches consistent with each other,
+    so the search can stop once top_forward + top_backward >= best path found.
+    queue: priority queue class for both open sets (see a_star_search).
+    Returns: (path, cost) or (path, cost, stats) if return_stats=True
+    """
+    import time
+    start_time = time.time()
+    
+    start = graph.to_index(start_id) if start_id is not None else None
+    goal = graph.to_index(end_id) if end_id is not None else None
+    if start is None or goal is None:
+        if return_stats:
+            return None, float('inf'), {'algorithm_name': 'Bidirectional A*', 'nodes_explored': 0, 'heap_operations': 0, 'time_ms': 0}
+        return None, float('inf')
+    
+    lat, lon = graph.lat, graph.lon
+    offsets, targets = graph.csr_offsets, graph.csr_targets
+    rev_offsets, rev_sources, rev_edges = graph.reverse_adjacency()
+    costs = get_edge_costs(graph, mode)
+    max_speed = MAX_CAR_SPEED if mode == 'car' else MAX_WALK_SPEED
+    start_lat, start_lon, goal_lat, goal_lon = lat[start], lon[start], lat[goal], lon[goal]
+    
+    potentials = {}
+    def potential(i):
+        p = potentials.get(i)
+        if p is None:
+            to_goal = math.sqrt(((lat[i] - goal_lat) * METERS_PER_DEG_LAT)**2 + ((lon[i] - goal_lon) * METERS_PER_DEG_LON)**2)
+            to_start = math.sqrt(((lat[i] - start_lat) * METERS_PER_DEG_LAT)**2 + ((lon[i] - start_lon) * METERS_PER_DEG_LON)**2)
+            p = potentials[i] = (to_goal - to_start) / (2 * max_speed)
+        return p
+    
+    # Both sides' keys are offset by half the straight-line start-goal time, which makes
+    # them non-negative (p(i) >= -shift by the triangle inequality), as RadixHeap needs
+    shift = math.sqrt(((start_lat - goal_lat) * METERS_PER_DEG_LAT)**2 + ((start_lon - goal_lon) * METERS_PER_DEG_LON)**2) / (2 * max_speed)
+    
+    forward = get_search_context(graph, 0)
+    backward = get_search_context(graph, 1)
+    gen_f, gen_b = forward.begin(start), backward.begin(goal)
+    g_f, parent_f, stamp_f = forward.g_score, forward.parent, forward.stamp
+    g_b, parent_b, stamp_b = backward.g_score, backward.parent, backward.stamp
+    
+    open_f, open_b = (queue or MinHeap)(), (queue or MinHeap)()
+    open_f.push((potential(start) + shift, start))
+    open_b.push((shift - potential(goal), goal))
+    heap_operations = 2
+    explored_f = explored_b = 0
+    
+    best_cost = 0 if start == goal else INF
+    meeting = start if start == goal else -1
+    
+    while not open_f.is_empty() and not open_b.is_empty():
+        if open_f.peek()[0] + open_b.peek()[0] >= best_cost + 2 * shift:
+            break
+        
+        if open_f.peek()[0] <= open_b.peek()[0]:
+            key, u = open_f.pop()
+            heap_operations += 1
+            if key > g_f[u] + potential(u) + shift:
+                continue  # Stale entry
+            explored_f += 1
+            for e in range(offsets[u], offsets[u + 1]):
+                edge_cost = costs[e]
+                if edge_cost == INF:
+                    continue
+                v = targets[e]
+                tentative_g = g_f[u] + edge_cost
+                if stamp_f[v] != gen_f or tentative_g < g_f[v]:
+                    stamp_f[v] = gen_f
+                    g_f[v] = tentative_g
+                    parent_f[v] = u
+                    open_f.push((tentative_g + potential(v) + shift, v))
+                    heap_operations += 1
+                    if stamp_b[v] == gen_b and tentative_g + g_b[v] < best_cost:
+                        best_cost = tentative_g + g_b[v]
+                        meeting = v
+        else:
+            key, u = open_b.pop()
+            heap_operations += 1
+            if key > g_b[u] - potential(u) + shift:
+                continue  # Stale entry
+            explored_b += 1
+            for slot in range(rev_offsets[u], rev_offsets[u + 1]):
+                edge_cost = costs[rev_edges[slot]]
+                if edge_cost == INF:
+                    continue
+                v = rev_sources[slot]
+                tentative_g = g_b[u] + edge_cost
+                if stamp_b[v] != gen_b or tentative_g < g_b[v]:
+                    stamp_b[v] = gen_b
+                    g_b[v] = tentative_g
+                    parent_b[v] = u
+                    open_b.push((tentative_g - potential(v) + shift, v))
+                    heap_operations += 1
+                    if stamp_f[v] == gen_f and tentative_g + g_f[v] < best_cost:
+                        best_cost = tentative_g + g_f[v]
+                        meeting = v
+    
+    elapsed_ms = (time.time() - start_time) * 1000
+    stats = {
+        'algorithm_name': 'Bidirectional A*',
+        'nodes_explored': explored_f + explored_b,
+        'nodes_explored_forward': explored_f,
+        'nodes_explored_backward': explored_b,
+        'heap_operations': heap_operations,
+        'time_ms': elapsed_ms
+    }
+    
+    if meeting == -1:
+        if return_stats:
+            return None, float('inf'), stats
+        return None, float('inf')
+    
+    # Forward half runs start -> meeting, backward parents lead meeting -> goal
+    path = _reconstruct_osm_path(graph, parent_f, meeting)
+    current = meeting
+    while parent_b[current] != -1:
+        current = parent_b[current]
+        path.append(graph.node_ids[current])
+    
+    if return_stats:
+        return path, best_cost, stats
+    return path, best_cost
+
 #  BFS SEARCH (Farida) 
 def bfs_search(graph, start, end, return_stats=False):
     """
@@ -192,21 +501,26 @@ def bfs_search(graph, start, end, return_stats=False):
     import time
     start_time = time.time()
     
-    if start not in graph.nodes or end not in graph.nodes:
+    source, goal = graph.to_index(start), graph.to_index(end)
+    if source is None or goal is None:
         if return_stats:
             return None, 0, {'algorithm_name': 'BFS', 'nodes_explored': 0, 'heap_operations': 0, 'time_ms': 0}
         return None, 0
 
-    queue = deque([start])
-    visited = {start: None}
+    offsets, targets = graph.csr_offsets, graph.csr_targets
+    
+    queue = deque([source])
+    context = get_search_context(graph)
+    generation = context.begin(source)
+    parent, stamp = context.parent, context.stamp
     nodes_explored = 0
 
     while queue:
         current = queue.popleft()
         nodes_explored += 1
 
-        if current == end:
-            path = reconstruct_path(visited, end)
+        if current == goal:
+            path = _reconstruct_osm_path(graph, parent, goal)
             elapsed_ms = (time.time() - start_time) * 1000
             
             if return_stats:
@@ -219,93 +533,522 @@ def bfs_search(graph, start, end, return_stats=False):
                 return path, len(path) - 1, stats
             return path, len(path) - 1
 
-        neighbors = graph.get_neighbors(current)
-        for neighbor_data in neighbors:
-            neighbor_id = neighbor_data[0]
+        for e in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[e]
 
-            if neighbor_id not in visited:
-                visited[neighbor_id] = current
-                queue.append(neighbor_id)
+            if stamp[neighbor] != generation:
+                stamp[neighbor] = generation
+                parent[neighbor] = current
+                queue.append(neighbor)
     
     if return_stats:
         return None, 0, {'algorithm_name': 'BFS', 'nodes_explored': nodes_explored, 'heap_operations': 0, 'time_ms': 0}
     return None, 0
 
-#  K-SHORTEST PATHS (Ahmed) 
-def _modify_edge_weight(graph, u, v, new_weight):
-    """Helper to modify edge weight in adj_list."""
-    if u not in graph.adj_list:
-        return None
+#  ONE-TO-MANY DIJKSTRA
+def one_to_many(graph, source_id, target_ids, mode='car', return_stats=False, context=None, queue=None):
+    """
+    Single Dijkstra sweep from source_id that stops once every target is settled.
+    Paths are read off the parent pointers before returning, so the (reused)
+    search context is free again afterwards. queue: priority queue class (see a_star_search).
+    Returns: (costs, paths) dicts keyed by target OSM id (inf / None when unreachable),
+    or (costs, paths, stats) if return_stats=True
+    """
+    import time
+    start_time = time.time()
+
+    costs_out = {t: float('inf') for t in target_ids}
+    paths_out = {t: None for t in target_ids}
+    source = graph.to_index(source_id) if source_id is not None else None
+
+    pending = {}
+    for t in target_ids:
+        i = graph.to_index(t) if t is not None else None
+        if i is not None:
+            pending.setdefault(i, []).append(t)
+
+    nodes_explored = 0
+    heap_operations = 0
+    if source is not None and pending:
+        offsets, targets = graph.csr_offsets, graph.csr_targets
+        costs = get_edge_costs(graph, mode)
+        context = context or get_search_context(graph)
+        generation = context.begin(source)
+        g_score, parent, stamp = context.g_score, context.parent, context.stamp
+
+        open_set = (queue or MinHeap)()
+        open_set.push((0, source))
+        heap_operations = 1
+
+        while pending and not open_set.is_empty():
+            d, current = open_set.pop()
+            heap_operations += 1
+            if d > g_score[current]:
+                continue  # Stale entry
+            nodes_explored += 1
 
-    neighbors = graph.adj_list[u]
-    for i, data in enumerate(neighbors):
-        if data[0] == v:
-            new_tuple = (data[0], new_weight, data[2], data[3], data[4], data[5])
-            graph.adj_list[u][i] = new_tuple
-            return data[1]
-    return None
+            if current in pending:
+                path = _reconstruct_osm_path(graph, parent, current)
+                for t in pending.pop(current):
+                    costs_out[t] = d
+                    paths_out[t] = path
 
-def get_k_shortest_paths(graph, start_id, end_id, k=3, mode='car'):
+            for e in range(offsets[current], offsets[current + 1]):
+                edge_cost = costs[e]
+                if edge_cost == INF:
+                    continue
+                neighbor = targets[e]
+                tentative_g = d + edge_cost
+                if stamp[neighbor] != generation or tentative_g < g_score[neighbor]:
+                    stamp[neighbor] = generation
+                    parent[neighbor] = current
+                    g_score[neighbor] = tentative_g
+                    open_set.push((tentative_g, neighbor))
+                    heap_operations += 1
+
+    if return_stats:
+        stats = {
+            'algorithm_name': 'Dijkstra (One-to-Many)',
+            'nodes_explored': nodes_explored,
+            'heap_operations': heap_operations,
+            'time_ms': (time.time() - start_time) * 1000
+        }
+        return costs_out, paths_out, stats
+    return costs_out, paths_out
+
+#  LEG CACHE
+class LegCache:
     """
-    Finds top k distinct routes using Yen's algorithm variant.
-    Uses edge penalization to encourage route diversity.
+    Memo of point-to-point legs for one request (a TSP optimization, a multi-stop
+    route, ...): (from_id, to_id, mode, traffic profile) -> (path, cost).
+    Unreachable legs are cached too, as (None, inf).
     """
-    found_paths = []
-    penalized_edges = []
-    seen_path_signatures = set()
+    def __init__(self):
+        self.legs = {}
+        self.hits = 0
+        self.misses = 0
+    
+    def _key(self, graph, from_id, to_id, mode):
+        return (from_id, to_id, mode, 'normal' if mode == 'walk' else traffic_profile(graph))
+    
+    def get(self, graph, from_id, to_id, mode):
+        """Cached (path, cost) or None, counting the hit or miss."""
+        leg = self.legs.get(self._key(graph, from_id, to_id, mode))
+        if leg is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return leg
+    
+    def put(self, graph, from_id, to_id, mode, path, cost):
+        self.legs[self._key(graph, from_id, to_id, mode)] = (path, cost)
+    
+    def stats(self):
+        return {'leg_cache_hits': self.hits, 'leg_cache_misses': self.misses}
 
-    for iteration in range(k):
-        path, cost = a_star_search(graph, start_id, end_id, mode)
-        
-        if not path:
-            break
-        
-        # Create a signature to check for duplicate paths
-        path_sig = tuple(path[::max(1, len(path)//10)])  # Sample every ~10% of nodes
+#  PARALLEL LEG SEARCHES
+# Fewer sweeps than this run serially: one sweep takes ~0.2 s, a forked worker ~20 ms
+# to start, but a spawned one ~0.4 s to import and map the snapshot
+PARALLEL_MIN_SWEEPS = 8
+
+_worker_graph = None
+
+def _init_leg_worker(graph, snapshot_file=None, checksum=None):
+    """Process pool initializer: keep the fork-inherited graph, or map the snapshot once (spawn)."""
+    global _worker_graph
+    if graph is None:
+        from structures import CityGraph
+        graph = CityGraph(backend='mmap')
+        graph.attach_snapshot(snapshot_file, checksum)
+    _worker_graph = graph
+
+def _leg_sweep_task(task):
+    source, targets, mode, profile = task
+    _worker_graph.rush_hour_active = profile == 'rush'
+    return one_to_many(_worker_graph, source, targets, mode, return_stats=True)
+
+def run_leg_sweeps(graph, tasks, mode='car', workers=1):
+    """
+    one_to_many(graph, source, targets, mode) for every (source, targets) in tasks.
+    With workers > 1 and at least PARALLEL_MIN_SWEEPS tasks, the sweeps are spread
+    over a process pool of at most one worker per task. Workers get the graph
+    once: inherited through fork (no copy until written), or by mapping the graph
+    snapshot where fork is unavailable. Results come back in task order, so the
+    output is identical to the serial run.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    
+    if workers > 1 and len(tasks) >= PARALLEL_MIN_SWEEPS:
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context, initargs = multiprocessing.get_context('fork'), (graph,)
+        elif graph.snapshot_file and graph.source_checksum:
+            context, initargs = multiprocessing.get_context('spawn'), (None, graph.snapshot_file, graph.source_checksum)
+        else:
+            context = None
+        if context is not None:
+            profile = traffic_profile(graph)
+            get_edge_costs(graph, mode)  # Built once here so forked workers inherit it
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=context,
+                                     initializer=_init_leg_worker, initargs=initargs) as pool:
+                return list(pool.map(_leg_sweep_task, [(source, targets, mode, profile) for source, targets in tasks]))
+    
+    return [one_to_many(graph, source, targets, mode, return_stats=True) for source, targets in tasks]
+
+def build_cost_matrix(graph, points, mode='car', leg_cache=None, workers=1):
+    """
+    Leg costs between every pair of points from one one_to_many sweep per point.
+    Legs already in leg_cache are reused; a sweep only runs for sources with missing legs.
+    workers > 1 runs the sweeps in parallel processes (see run_leg_sweeps).
+    Returns (matrix, legs, stats): matrix[i][j] is the cost from points[i] to points[j]
+    (inf if unreachable) and legs[(points[i], points[j])] the OSM path of that leg.
+    """
+    leg_cache = leg_cache if leg_cache is not None else LegCache()
+    stats = {'nodes_explored': 0, 'heap_operations': 0, 'dijkstra_sweeps': 0}
+    
+    rows = []
+    tasks = []
+    for source in points:
+        row_legs = {target: leg_cache.get(graph, source, target, mode) for target in points}
+        missing = [target for target, leg in row_legs.items() if leg is None]
+        if missing:
+            tasks.append((source, missing))
+        rows.append(row_legs)
+    
+    results = iter(run_leg_sweeps(graph, tasks, mode, workers))
+    matrix = []
+    legs = {}
+    for source, row_legs in zip(points, rows):
+        missing = [target for target, leg in row_legs.items() if leg is None]
+        if missing:
+            costs, paths, sweep_stats = next(results)
+            for target in missing:
+                row_legs[target] = (paths[target], costs[target])
+                leg_cache.put(graph, source, target, mode, paths[target], costs[target])
+            stats['nodes_explored'] += sweep_stats['nodes_explored']
+            stats['heap_operations'] += sweep_stats['heap_operations']
+            stats['dijkstra_sweeps'] += 1
         
-        if path_sig in seen_path_signatures:
-            # Path is too similar, try harder penalty
-            for j in range(len(path) - 1):
-                u, v = path[j], path[j+1]
-                old_w = _modify_edge_weight(graph, u, v, float('inf'))
-                if old_w is not None and old_w != float('inf'):
-                    penalized_edges.append((u, v, old_w))
+        matrix.append([row_legs[target][1] for target in points])
+        for target in points:
+            if row_legs[target][0]:
+                legs[(source, target)] = row_legs[target][0]
+    return matrix, legs, stats
+
+#  K-SHORTEST PATHS (Ahmed) 
+class _ReverseTree:
+    """
+    Shortest-path tree into goal over reversed edges, grown lazily: distance(v)
+    settles nodes in order of travel time to goal until v is settled. Gives exact
+    remaining times (the heuristic for spur searches) and each node's next hop and
+    the CSR edge id it leaves by. queue: priority queue class (see a_star_search).
+    """
+    def __init__(self, graph, goal, costs, queue=None):
+        self.offsets, self.sources, self.edge_ids = graph.reverse_adjacency()
+        self.costs = costs
+        self.dist = {goal: 0}
+        self.next_hop = {goal: -1}
+        self.next_edge = {goal: -1}
+        self.settled = set()
+        self.heap = (queue or MinHeap)()
+        self.heap.push((0, goal))
+    
+    def distance(self, v):
+        """Travel time from dense node v to goal (inf if v cannot reach it)."""
+        offsets, sources, edge_ids, costs = self.offsets, self.sources, self.edge_ids, self.costs
+        dist, next_hop, next_edge, settled, heap = self.dist, self.next_hop, self.next_edge, self.settled, self.heap
+        while v not in settled:
+            if heap.is_empty():
+                return INF
+            d, x = heap.pop()
+            if x in settled:
+                continue  # Stale entry
+            settled.add(x)
+            for slot in range(offsets[x], offsets[x + 1]):
+                edge_cost = costs[edge_ids[slot]]
+                if edge_cost == INF:
+                    continue
+                u = sources[slot]
+                if d + edge_cost < dist.get(u, INF):
+                    dist[u] = d + edge_cost
+                    next_hop[u] = x
+                    next_edge[u] = edge_ids[slot]
+                    heap.push((dist[u], u))
+        return dist[v]
+
+def _spur_search(graph, tree, costs, spur, goal, banned_nodes, banned_edges, queue=None):
+    """
+    Cheapest spur -> goal path avoiding banned_nodes and banned_edges (CSR edge ids, so
+    one of several parallel edges can be banned on its own).
+    A* with the reverse tree's exact distances as heuristic. As soon as a popped node's
+    tree path to goal avoids every exclusion, that tree path completes the route, so a
+    spur whose tree path is untouched costs a single pop. queue: priority queue class.
+    Returns (dense index path, CSR edge ids along it, cost) or (None, None, inf).
+    """
+    offsets, targets = graph.csr_offsets, graph.csr_targets
+    clean = {goal: True}
+    
+    def tree_path_clean(v):
+        walk = []
+        x = v
+        while x not in clean:
+            if x in banned_nodes or tree.next_edge[x] in banned_edges:
+                clean[x] = False
+                break
+            walk.append(x)
+            x = tree.next_hop[x]
+        for w in walk:
+            clean[w] = clean[x]
+        return clean[v]
+    
+    h = tree.distance(spur)
+    if h == INF:
+        return None, None, INF
+    g_score = {spur: 0}
+    came_from = {spur: (-1, -1)}   # node -> (previous node, CSR edge id)
+    closed = set()
+    open_set = (queue or MinHeap)()
+    open_set.push((h, spur))
+    
+    while not open_set.is_empty():
+        _, current = open_set.pop()
+        if current in closed:
             continue
-            
-        seen_path_signatures.add(path_sig)
-        found_paths.append((path, cost))
+        closed.add(current)
         
-        # Penalize edges in this path - use multiplier instead of inf for first pass
-        # This encourages alternatives while not completely blocking
-        penalty_multiplier = 10.0 if iteration == 0 else float('inf')
+        if tree_path_clean(current):
+            path, edges = [current], []
+            while came_from[path[-1]][0] != -1:
+                previous, e = came_from[path[-1]]
+                path.append(previous)
+                edges.append(e)
+            path.reverse()
+            edges.reverse()
+            node = current
+            while node != goal:
+                edges.append(tree.next_edge[node])
+                node = tree.next_hop[node]
+                path.append(node)
+            return path, edges, g_score[current] + tree.dist[current]
         
-        for j in range(len(path) - 1):
-            u, v = path[j], path[j+1]
-            current_weight = None
-            
-            # Get current weight
-            if u in graph.adj_list:
-                for data in graph.adj_list[u]:
-                    if data[0] == v:
-                        current_weight = data[1]
-                        break
+        for e in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[e]
+            edge_cost = costs[e]
+            if edge_cost == INF or neighbor in closed or neighbor in banned_nodes or e in banned_edges:
+                continue
+            h = tree.distance(neighbor)
+            if h == INF:
+                continue
+            tentative_g = g_score[current] + edge_cost
+            if tentative_g < g_score.get(neighbor, INF):
+                g_score[neighbor] = tentative_g
+                came_from[neighbor] = (current, e)
+                open_set.push((tentative_g + h, neighbor))
+    return None, None, INF
+
+def get_k_shortest_paths(graph, start_id, end_id, k=3, mode='car', queue=None):
+    """
+    Finds the k shortest loopless routes with Yen's algorithm.
+    The graph is never modified: the edges and nodes removed for each spur search
+    are per-call exclusion sets and all search state is local, so concurrent calls
+    (and other searches) can share one graph. The reverse shortest-path tree from
+    the goal is built once per call and reused by every spur search. Routes are
+    edge sequences, so parallel roads between the same two nodes are told apart.
+    queue: priority queue class for the tree and spur searches (see a_star_search).
+    Returns: list[(path, cost)], cheapest first
+    """
+    source = graph.to_index(start_id) if start_id is not None else None
+    goal = graph.to_index(end_id) if end_id is not None else None
+    if source is None or goal is None:
+        return []
+    
+    costs = get_edge_costs(graph, mode)
+    tree = _ReverseTree(graph, goal, costs, queue)
+    first_path, first_edges, first_cost = _spur_search(graph, tree, costs, source, goal, set(), set(), queue)
+    if first_path is None:
+        return []
+    
+    found_paths = [(first_path, first_edges, first_cost)]
+    candidates = MinHeap()
+    seen_routes = {tuple(first_edges)}
+    
+    while len(found_paths) < k:
+        previous, previous_edges, _ = found_paths[-1]
+        root_cost = 0
+        for i in range(len(previous) - 1):
+            spur = previous[i]
+            root_edges = previous_edges[:i]
+            # Leave the root by an edge no accepted route with this root has used
+            banned_edges = {edges[i] for _, edges, _ in found_paths if edges[:i] == root_edges}
+            banned_nodes = set(previous[:i])
             
-            if current_weight is not None and current_weight != float('inf'):
-                new_weight = current_weight * penalty_multiplier if penalty_multiplier != float('inf') else float('inf')
-                old_w = _modify_edge_weight(graph, u, v, new_weight)
-                if old_w is not None:
-                    penalized_edges.append((u, v, old_w))
-                    
-                    # Also penalize reverse direction
-                    old_w_rev = _modify_edge_weight(graph, v, u, new_weight)
-                    if old_w_rev is not None:
-                        penalized_edges.append((v, u, old_w_rev))
-
-    # Restore graph state
-    for u, v, original_weight in penalized_edges:
-        _modify_edge_weight(graph, u, v, original_weight)
+            spur_path, spur_edges, spur_cost = _spur_search(graph, tree, costs, spur, goal, banned_nodes, banned_edges, queue)
+            if spur_path is not None:
+                candidate_edges = root_edges + spur_edges
+                if tuple(candidate_edges) not in seen_routes:
+                    seen_routes.add(tuple(candidate_edges))
+                    candidates.push((root_cost + spur_cost, previous[:i] + spur_path, candidate_edges))
+            root_cost += costs[previous_edges[i]]
         
-    return found_paths
+        if candidates.is_empty():
+            break
+        cost, path, edges = candidates.pop()
+        found_paths.append((path, edges, cost))
+    
+    node_ids = graph.node_ids
+    return [([node_ids[i] for i in path], cost) for path, _, cost in found_paths]
+
+#  ALTERNATIVE ROUTES (plateaus)
+def _search_tree(graph, root, costs, reverse=False, limit=INF, target=None, stretch=0, queue=None, estimate=None):
+    """
+    Shortest-path tree from root (into root when reverse=True) settling nodes up to
+    travel time limit. If target is given, the limit becomes (1 + stretch) * d(target)
+    once target is settled. estimate(i), a lower bound on the time between i and the
+    far end of the route, orders the search A*-style and limits it to
+    d(i) + estimate(i) <= limit, the nodes a route within the limit can pass.
+    A node is settled again when a shorter path to it turns up, so those nodes get
+    exact times even when estimate is not consistent (see RoutingOverlay.query).
+    Returns (dist, link) dicts over settled nodes, where link is the parent
+    (forward) or next hop (reverse); the root maps to -1.
+    queue: priority queue class (see a_star_search).
+    """
+    if reverse:
+        offsets, ends, edge_ids = graph.reverse_adjacency()
+    else:
+        offsets, ends, edge_ids = graph.csr_offsets, graph.csr_targets, None
+    
+    best = {root: 0}
+    link = {root: -1}
+    dist = {}
+    estimate = estimate or (lambda i: 0)
+    heap = (queue or MinHeap)()
+    heap.push((estimate(root), root))
+    while not heap.is_empty():
+        key, x = heap.pop()
+        d = best[x]
+        if dist.get(x) == d:
+            continue  # Stale entry: already settled with its best time
+        if key > limit:
+            break
+        dist[x] = d
+        if x == target:
+            limit = (1 + stretch) * d
+        for slot in range(offsets[x], offsets[x + 1]):
+            edge_cost = costs[edge_ids[slot] if reverse else slot]
+            if edge_cost == INF:
+                continue
+            y = ends[slot]
+            if d + edge_cost >= best.get(y, INF):
+                continue
+            key = d + edge_cost + estimate(y)
+            if key > limit:
+                continue  # Cannot lie on a route within the limit (limit only shrinks)
+            best[y] = d + edge_cost
+            link[y] = x
+            heap.push((key, y))
+    return dist, {x: link[x] for x in dist}
+
+def get_alternative_routes(graph, start_id, end_id, k=3, mode='car', max_stretch=0.3, max_overlap=0.7, return_stats=False, queue=None):
+    """
+    Up to k meaningfully different routes from two shortest-path trees (plateau method).
+    A forward tree from the start and a backward tree into the destination cover the
+    nodes that a route at most (1 + max_stretch) times the best time can pass: the
+    forward tree is pruned with the A* heuristic, the backward tree with the exact
+    forward times, so it only settles nodes on such a route. Edges that lie on both trees form
+    plateaus; the route through a plateau follows the forward tree to it and the
+    backward tree after it, and is locally optimal along the whole plateau.
+    A candidate's time is known from the trees before its route is built, so the
+    stretch filter costs nothing; the overlap filter walks the route outward from the
+    plateau and gives up as soon as more than max_overlap of its time is shared with
+    an already chosen route. Longer plateaus win.
+    queue: priority queue class for both trees (see a_star_search).
+    Returns: list[(path, cost)], best route first, or (routes, stats) if return_stats=True
+    """
+    import time
+    start_time = time.time()
+    source = graph.to_index(start_id) if start_id is not None else None
+    goal = graph.to_index(end_id) if end_id is not None else None
+    stats = {'algorithm_name': 'Alternative Routes (Plateaus)', 'nodes_explored': 0, 'heap_operations': 0, 'time_ms': 0}
+    if source is None or goal is None:
+        return ([], stats) if return_stats else []
+    
+    costs = get_edge_costs(graph, mode)
+    to_goal = (graph.landmarks or straight_line_heuristic)(graph, source, goal, mode)
+    dist_f, parent = _search_tree(graph, source, costs, target=goal, stretch=max_stretch, queue=queue, estimate=to_goal)
+    dist_b, next_hop = {}, {}
+    limit = INF   # Goal unreachable: no backward tree and no candidates
+    if goal in dist_f:
+        limit = (1 + max_stretch) * dist_f[goal]
+        # Exact forward times make the backward tree settle only nodes with d_f + d_b <= limit
+        dist_b, next_hop = _search_tree(graph, goal, costs, reverse=True, limit=limit, queue=queue,
+                                        estimate=lambda i: dist_f.get(i, INF))
+    
+    # Plateau starts: tree edge u -> v on both trees, with nothing on both trees before u
+    def on_both(u, v):
+        return next_hop.get(u) == v and parent.get(v) == u
+    candidates = []
+    for v, d in dist_f.items():
+        if v not in dist_b or d + dist_b[v] > limit:
+            continue
+        u = parent[v]
+        if u != -1 and on_both(u, v):
+            continue  # Not the first node of its plateau
+        end = v
+        while end != goal and on_both(end, next_hop[end]):
+            end = next_hop[end]
+        plateau = dist_f[end] - d
+        if plateau > 0:
+            candidates.append((d + dist_b[v] - plateau, d + dist_b[v], v))
+    candidates.sort()
+    
+    chosen = []   # (path, cost, {(a, b): hop time})
+    
+    def route_via(v, cost):
+        """
+        Route through v with each hop's time read off the trees, walked back to the
+        start and then on to the goal. None once it shares too much with a chosen route.
+        """
+        shared = [0] * len(chosen)
+        hops = {}
+        head, tail = [v], []
+        for ahead in (False, True):
+            a = v
+            while (a != goal) if ahead else (parent[a] != -1):
+                b = next_hop[a] if ahead else parent[a]
+                hop = (a, b) if ahead else (b, a)
+                hops[hop] = dist_b[a] - dist_b[b] if ahead else dist_f[a] - dist_f[b]
+                for n, (_, _, taken) in enumerate(chosen):
+                    if hop in taken:
+                        shared[n] += hops[hop]
+                        if shared[n] > max_overlap * cost:
+                            return None
+                (tail if ahead else head).append(b)
+                a = b
+        return head[::-1] + tail, hops
+    
+    for _, cost, v in candidates:
+        if len(chosen) == k:
+            break
+        route = route_via(v, cost)
+        if route is None:
+            continue
+        path, hops = route
+        if len(set(path)) != len(path):
+            continue  # Forward and backward halves cross: not a simple route
+        chosen.append((path, cost, hops))
+    
+    node_ids = graph.node_ids
+    chosen.sort(key=lambda route: route[1])
+    routes = [([node_ids[i] for i in path], cost) for path, cost, _ in chosen]
+    if not return_stats:
+        return routes
+    stats.update({
+        'nodes_explored': len(dist_f) + len(dist_b),
+        'nodes_explored_forward': len(dist_f),
+        'nodes_explored_backward': len(dist_b),
+        'time_ms': (time.time() - start_time) * 1000
+    })
+    return routes, stats
 
 #  TRAFFIC SIMULATION (Ahmed) 
 # Traffic multipliers for rush hour
@@ -337,45 +1080,16 @@ def reset_traffic(graph, modifications=None):
     print(" Traffic cleared.")
 
 #  TSP OPTIMIZATION (Usman) 
-def _nearest_neighbor_tsp(graph, start, stops, mode):
-    """
-    Greedy Nearest Neighbor heuristic for TSP.
-    O(n²) - much faster than brute force for larger stop counts.
-    """
-    unvisited = list(stops)
-    route = []
-    current = start
-    total_cost = 0
-    segments = {}
-    
-    while unvisited:
-        best_next = None
-        best_cost = float('inf')
-        best_path = None
-        
-        for candidate in unvisited:
-            path, cost = a_star_search(graph, current, candidate, mode)
-            if path and cost < best_cost:
-                best_cost = cost
-                best_next = candidate
-                best_path = path
-        
-        if best_next is None:
-            return None, float('inf'), {}
-        
-        route.append(best_next)
-        segments[(current, best_next)] = best_path
-        total_cost += best_cost
-        current = best_next
-        unvisited.remove(best_next)
-    
-    return route, total_cost, segments
-
-
-def optimize_route_order(graph, start, list_of_stops, mode='car'):
+def optimize_route_order(graph, start, list_of_stops, mode='car', memory_limit=None, anneal_ms=0, leg_cache=None, workers=1):
     """
     TSP Approximation - Finds optimal visiting order for multiple stops.
-    Uses brute-force for ≤4 stops, Nearest Neighbor heuristic for more.
+    Leg costs come from an (n+1)x(n+1) matrix built with n+1 one-to-many sweeps,
+    then orderings are evaluated on the matrix without further searches.
+    Uses brute-force for ≤4 stops, Held-Karp dynamic programming while its tables
+    fit in memory_limit bytes (up to 16 stops by default), Nearest Neighbor improved
+    by 2-opt / Or-opt beyond, plus simulated annealing for anneal_ms milliseconds if set.
+    leg_cache: optional LegCache shared with other calls of the same request.
+    workers: processes for the leg searches (1 = run them in this process).
     
     Returns: (best_order, total_cost, segment_paths, algo_stats)
     """
@@ -386,14 +1100,44 @@ def optimize_route_order(graph, start, list_of_stops, mode='car'):
         return [], 0, {}, {'algorithm_name': 'TSP', 'nodes_explored': 0, 'heap_operations': 0, 'time_ms': 0, 'permutations_checked': 0}
     
     n_stops = len(list_of_stops)
-    total_nodes_explored = 0
-    total_heap_ops = 0
-    total_a_star_calls = 0
+    points = [start] + list(list_of_stops)
+    leg_cache = leg_cache if leg_cache is not None else LegCache()
+    matrix, legs, matrix_stats = build_cost_matrix(graph, points, mode, leg_cache, workers)
+    
+    # Held-Karp gives the optimal order in O(2^n * n^2) as long as its tables fit
+    solved = None
+    if n_stops > 4:
+        solved = held_karp_tsp(matrix, HELD_KARP_MEMORY_LIMIT if memory_limit is None else memory_limit)
+    if solved is not None:
+        print(f"\n Solving {n_stops} stops exactly (Held-Karp)...")
+        order, cost = solved
+        elapsed_ms = (time_module.time() - start_time) * 1000
+        
+        if order:
+            print(f" Found optimal route! Total time: {cost/60:.1f} minutes")
+        else:
+            print(" No valid route found for these stops")
+        
+        algo_stats = {
+            'algorithm_name': f'TSP (Held-Karp, {n_stops} stops)',
+            'nodes_explored': matrix_stats['nodes_explored'],
+            'heap_operations': matrix_stats['heap_operations'],
+            'time_ms': elapsed_ms,
+            'dijkstra_sweeps': matrix_stats['dijkstra_sweeps'],
+            'dp_states': (1 << n_stops) * n_stops,
+            **leg_cache.stats()
+        }
+        if not order:
+            return [], cost, {}, algo_stats
+        return [points[i] for i in order], cost, _order_segments(points, [0] + order, legs), algo_stats
     
-    # Use Nearest Neighbor for larger stop counts (faster)
+    # Nearest Neighbor construction, then 2-opt / Or-opt (and optional annealing) on the matrix
     if n_stops > 4:
-        print(f"\n Using Nearest Neighbor heuristic for {n_stops} stops...")
-        order, cost, segments, nn_stats = _nearest_neighbor_tsp_with_stats(graph, start, list_of_stops, mode)
+        print(f"\n Using Nearest Neighbor heuristic + local search for {n_stops} stops...")
+        order, cost = _nearest_neighbor_order(matrix)
+        improve_stats = {'improvement_iterations': 0, 'anneal_acceptances': 0, 'improve_ms': 0}
+        if order:
+            order, cost, improve_stats = improve_route_order(matrix, order, anneal_ms)
         elapsed_ms = (time_module.time() - start_time) * 1000
         
         if order:
@@ -402,131 +1146,321 @@ def optimize_route_order(graph, start, list_of_stops, mode='car'):
             print(" No valid route found for these stops")
         
         algo_stats = {
-            'algorithm_name': f'TSP (Nearest Neighbor, {n_stops} stops)',
-            'nodes_explored': nn_stats['nodes_explored'],
-            'heap_operations': nn_stats['heap_operations'],
+            'algorithm_name': f'TSP (Nearest Neighbor + 2-opt, {n_stops} stops)',
+            'nodes_explored': matrix_stats['nodes_explored'],
+            'heap_operations': matrix_stats['heap_operations'],
             'time_ms': elapsed_ms,
-            'a_star_calls': nn_stats['a_star_calls']
+            'dijkstra_sweeps': matrix_stats['dijkstra_sweeps'],
+            'improvement_iterations': improve_stats['improvement_iterations'],
+            'anneal_acceptances': improve_stats['anneal_acceptances'],
+            'improve_ms': improve_stats['improve_ms'],
+            **leg_cache.stats()
         }
-        return order or [], cost, segments, algo_stats
+        if not order:
+            return [], cost, {}, algo_stats
+        return [points[i] for i in order], cost, _order_segments(points, [0] + order, legs), algo_stats
     
     # Brute force for small number of stops
-    all_permutations = list(permutations(list_of_stops))
+    all_permutations = list(permutations(range(1, n_stops + 1)))
     
     best_order = None
     best_total_cost = float('inf')
-    best_segments = {}
     
     print(f"\n Evaluating {len(all_permutations)} possible route orders...")
     
     for perm in all_permutations:
-        full_route = [start] + list(perm)
         total_cost = 0
-        segments = {}
-        valid_route = True
-        
-        for i in range(len(full_route) - 1):
-            from_node = full_route[i]
-            to_node = full_route[i + 1]
-            
-            path, cost, stats = a_star_search(graph, from_node, to_node, mode, return_stats=True)
-            total_a_star_calls += 1
-            total_nodes_explored += stats['nodes_explored']
-            total_heap_ops += stats['heap_operations']
-            
-            if not path:
-                valid_route = False
-                break
-            
-            total_cost += cost
-            segments[(from_node, to_node)] = path
+        previous = 0
+        for stop in perm:
+            total_cost += matrix[previous][stop]
+            previous = stop
         
-        if valid_route and total_cost < best_total_cost:
+        # An unreachable leg makes the whole ordering inf
+        if total_cost < best_total_cost:
             best_total_cost = total_cost
             best_order = list(perm)
-            best_segments = segments.copy()
     
     elapsed_ms = (time_module.time() - start_time) * 1000
     
+    algo_stats = {
+        'algorithm_name': f'TSP (Brute Force, {n_stops} stops)',
+        'nodes_explored': matrix_stats['nodes_explored'],
+        'heap_operations': matrix_stats['heap_operations'],
+        'time_ms': elapsed_ms,
+        'permutations_checked': len(all_permutations),
+        'dijkstra_sweeps': matrix_stats['dijkstra_sweeps'],
+        **leg_cache.stats()
+    }
+    
     if best_order is None:
         print(" No valid route found for these stops")
-        algo_stats = {
-            'algorithm_name': f'TSP (Brute Force, {n_stops} stops)',
-            'nodes_explored': total_nodes_explored,
-            'heap_operations': total_heap_ops,
-            'time_ms': elapsed_ms,
-            'permutations_checked': len(all_permutations),
-            'a_star_calls': total_a_star_calls
-        }
         return [], float('inf'), {}, algo_stats
     
     print(f" Found optimal route! Total time: {best_total_cost/60:.1f} minutes")
     
-    algo_stats = {
-        'algorithm_name': f'TSP (Brute Force, {n_stops} stops)',
-        'nodes_explored': total_nodes_explored,
-        'heap_operations': total_heap_ops,
-        'time_ms': elapsed_ms,
-        'permutations_checked': len(all_permutations),
-        'a_star_calls': total_a_star_calls
-    }
+    return [points[i] for i in best_order], best_total_cost, _order_segments(points, [0] + best_order, legs), algo_stats
+
+
+def _order_segments(points, order, legs):
+    """Leg paths {(from_id, to_id): path} along an ordering of point indices."""
+    return {(points[a], points[b]): legs[(points[a], points[b])] for a, b in zip(order, order[1:])}
+
+
+# Bytes Held-Karp may allocate for its tables (8-byte cost + 1-byte parent per state)
+HELD_KARP_MEMORY_LIMIT = 16 * 1024 * 1024
+
+def held_karp_tsp(matrix, memory_limit=HELD_KARP_MEMORY_LIMIT):
+    """
+    Exact open-path TSP over a cost matrix (index 0 = start, route ends at any stop).
+    State (mask, j) = cheapest way to leave the start, visit the stops in bitmask mask
+    and end at stop j; both tables are flat arrays indexed mask * n + j.
+    Returns (order of stop indices, total cost), (None, inf) if a stop is unreachable,
+    or None when the tables would exceed memory_limit bytes.
+    """
+    n = len(matrix) - 1
+    if n == 0:
+        return [], 0
+    full = 1 << n
+    if full * n * 9 > memory_limit or n > 127:
+        return None
     
-    return best_order, best_total_cost, best_segments, algo_stats
+    cost = array('d', [INF]) * (full * n)
+    parent = array('b', [-1]) * (full * n)
+    for j in range(n):
+        cost[(1 << j) * n + j] = matrix[0][j + 1]
+    
+    for mask in range(1, full):
+        base = mask * n
+        outside = [k for k in range(n) if not mask & (1 << k)]
+        if not outside:
+            continue
+        for j in range(n):
+            current = cost[base + j]
+            if current == INF:
+                continue  # j not in mask, or unreachable
+            row = matrix[j + 1]
+            for k in outside:
+                candidate = current + row[k + 1]
+                index = (mask | (1 << k)) * n + k
+                if candidate < cost[index]:
+                    cost[index] = candidate
+                    parent[index] = j
+    
+    # Cheapest final stop, then walk the parent table back to the start
+    base = (full - 1) * n
+    last, best = -1, INF
+    for j in range(n):
+        if cost[base + j] < best:
+            last, best = j, cost[base + j]
+    if last == -1:
+        return None, INF
+    
+    order = []
+    mask = full - 1
+    while last != -1:
+        order.append(last + 1)
+        previous = parent[mask * n + last]
+        mask &= ~(1 << last)
+        last = previous
+    order.reverse()
+    return order, best
 
 
-def _nearest_neighbor_tsp_with_stats(graph, start, stops, mode):
-    """Nearest Neighbor TSP with stats tracking."""
-    unvisited = list(stops)
+def _nearest_neighbor_order(matrix):
+    """
+    Nearest Neighbor TSP over a cost matrix (index 0 = start).
+    Returns (order of stop indices, total cost), or (None, inf) if a stop is unreachable.
+    """
+    unvisited = list(range(1, len(matrix)))
     route = []
-    current = start
+    current = 0
     total_cost = 0
-    segments = {}
-    
-    total_nodes_explored = 0
-    total_heap_ops = 0
-    a_star_calls = 0
     
     while unvisited:
         best_next = None
         best_cost = float('inf')
-        best_path = None
         
         for candidate in unvisited:
-            path, cost, stats = a_star_search(graph, current, candidate, mode, return_stats=True)
-            a_star_calls += 1
-            total_nodes_explored += stats['nodes_explored']
-            total_heap_ops += stats['heap_operations']
-            
-            if path and cost < best_cost:
+            cost = matrix[current][candidate]
+            if cost < best_cost:
                 best_cost = cost
                 best_next = candidate
-                best_path = path
         
         if best_next is None:
-            return None, float('inf'), {}, {'nodes_explored': total_nodes_explored, 'heap_operations': total_heap_ops, 'a_star_calls': a_star_calls}
+            return None, float('inf')
         
         route.append(best_next)
-        segments[(current, best_next)] = best_path
         total_cost += best_cost
         current = best_next
         unvisited.remove(best_next)
     
+    return route, total_cost
+
+# Finite stand-in for unreachable legs so move deltas never hit inf - inf
+UNREACHABLE_LEG = 1e9
+
+def _route_cost(matrix, route):
+    return sum(matrix[a][b] for a, b in zip(route, route[1:]))
+
+def _two_opt_pass(matrix, route):
+    """
+    Apply the first improving 2-opt move (reverse route[i..k]) and return True,
+    or False if none exists. The start (route[0]) stays fixed and the path is open.
+    Legs may be asymmetric, so the reversed segment is priced with backward prefix sums.
+    """
+    n = len(route)
+    forward = [0.0] * n
+    backward = [0.0] * n
+    for t in range(1, n):
+        forward[t] = forward[t - 1] + matrix[route[t - 1]][route[t]]
+        backward[t] = backward[t - 1] + matrix[route[t]][route[t - 1]]
+    
+    for i in range(1, n - 1):
+        before = route[i - 1]
+        for k in range(i + 1, n):
+            old = matrix[before][route[i]] + forward[k] - forward[i]
+            new = matrix[before][route[k]] + backward[k] - backward[i]
+            if k + 1 < n:
+                after = route[k + 1]
+                old += matrix[route[k]][after]
+                new += matrix[route[i]][after]
+            if new < old - 1e-9:
+                route[i:k + 1] = route[i:k + 1][::-1]
+                return True
+    return False
+
+def _or_opt_pass(matrix, route):
+    """
+    Apply the first improving Or-opt move (move a run of 1-3 stops elsewhere,
+    keeping its direction) and return True, or False if none exists.
+    """
+    n = len(route)
+    for length in (1, 2, 3):
+        for i in range(1, n - length + 1):
+            first, last = route[i], route[i + length - 1]
+            before = route[i - 1]
+            after = route[i + length] if i + length < n else None
+            
+            # Saving from cutting the run out and joining its neighbours
+            removed = matrix[before][first]
+            if after is not None:
+                removed += matrix[last][after] - matrix[before][after]
+            
+            rest = route[:i] + route[i + length:]
+            for j in range(1, len(rest) + 1):
+                if j == i:
+                    continue  # Same place
+                a = rest[j - 1]
+                b = rest[j] if j < len(rest) else None
+                added = matrix[a][first]
+                if b is not None:
+                    added += matrix[last][b] - matrix[a][b]
+                if added < removed - 1e-9:
+                    route[:] = rest[:j] + route[i:i + length] + rest[j:]
+                    return True
+    return False
+
+def _anneal(matrix, route, time_limit_ms, seed=0):
+    """
+    Time-bounded simulated annealing with random 2-opt and single-stop moves.
+    Returns the best route seen and the number of accepted moves.
+    """
+    import random
+    import time as time_module
+    rng = random.Random(seed)
+    n = len(route)
+    if n < 4:
+        return route, 0
+    
+    current, current_cost = list(route), _route_cost(matrix, route)
+    best, best_cost = list(current), current_cost
+    start_temp = max(current_cost / n * 0.1, 1e-6)
+    deadline = time_module.time() + time_limit_ms / 1000
+    temperature = start_temp
+    accepted = 0
+    step = 0
+    
+    while True:
+        # Cool linearly with the remaining time budget (checked every 64 moves)
+        step += 1
+        if step % 64 == 0:
+            remaining = deadline - time_module.time()
+            if remaining <= 0:
+                break
+            temperature = start_temp * max(remaining / (time_limit_ms / 1000), 1e-3)
+        
+        candidate = list(current)
+        i = rng.randrange(1, n)
+        k = rng.randrange(1, n)
+        if i == k:
+            continue
+        if rng.random() < 0.5:
+            i, k = min(i, k), max(i, k)
+            candidate[i:k + 1] = candidate[i:k + 1][::-1]
+        else:
+            candidate.insert(k, candidate.pop(i))
+        
+        delta = _route_cost(matrix, candidate) - current_cost
+        if delta < 0 or rng.random() < math.exp(-delta / temperature):
+            current, current_cost = candidate, current_cost + delta
+            accepted += 1
+            if current_cost < best_cost - 1e-9:
+                best, best_cost = list(current), current_cost
+    return best, accepted
+
+def improve_route_order(matrix, order, anneal_ms=0):
+    """
+    Local search on a stop order over a cost matrix (index 0 = start):
+    2-opt and Or-opt moves until neither improves, optionally followed by
+    anneal_ms of simulated annealing and another local search from its best route.
+    Returns (order, total cost, stats). improvement_iterations counts 2-opt /
+    Or-opt passes that shortened the route; anneal_acceptances counts the moves
+    annealing accepted, uphill ones included.
+    """
+    import time as time_module
+    start_time = time_module.time()
+    work = [[c if c < INF else UNREACHABLE_LEG for c in row] for row in matrix]
+    route = [0] + list(order)
+    iterations = 0
+    accepted = 0
+    
+    def descend():
+        moves = 0
+        while _two_opt_pass(work, route) or _or_opt_pass(work, route):
+            moves += 1
+        return moves
+    
+    iterations += descend()
+    if anneal_ms > 0:
+        annealed, accepted = _anneal(work, route, anneal_ms)
+        if _route_cost(work, annealed) < _route_cost(work, route):
+            route[:] = annealed
+        iterations += descend()
+    
     stats = {
-        'nodes_explored': total_nodes_explored,
-        'heap_operations': total_heap_ops,
-        'a_star_calls': a_star_calls
+        'improvement_iterations': iterations,
+        'anneal_acceptances': accepted,
+        'improve_ms': (time_module.time() - start_time) * 1000
     }
-    return route, total_cost, segments, stats
+    return route[1:], _route_cost(matrix, route), stats
 
 #  MULTI-STOP ROUTE 
-def multi_stop_route(graph, stops, mode='car'):
-    """Calculate route through multiple stops in given order."""
+def multi_stop_route(graph, stops, mode='car', leg_cache=None):
+    """
+    Calculate route through multiple stops in given order.
+    leg_cache: optional LegCache, so legs already searched in this request are reused.
+    """
+    leg_cache = leg_cache if leg_cache is not None else LegCache()
     full_path = []
     total_cost = 0
     for i in range(len(stops) - 1):
         start = stops[i]
         end = stops[i+1]
-        segment_path, segment_cost = a_star_search(graph, start, end, mode)
+        leg = leg_cache.get(graph, start, end, mode)
+        if leg is None:
+            leg = a_star_search(graph, start, end, mode)
+            leg_cache.put(graph, start, end, mode, *leg)
+        segment_path, segment_cost = leg
         if not segment_path:
             return None, float('inf')
         if i > 0:
@@ -0,0 +1,343 @@
+"""
+Contraction Hierarchies
+Preprocesses the static road network once per (mode, traffic profile) so that
+point-to-point queries only settle a few hundred nodes.
+
+Preprocessing contracts nodes one at a time (cheapest first by edge difference),
+adding a shortcut u -> w whenever the only shortest u -> w path runs through the
+contracted node. Every edge ends up pointing "upward" in the contraction order,
+and a query is a bidirectional Dijkstra that only ever climbs.
+
+Shortcuts remember the node they bypass, so paths are unpacked back into the
+original OSM nodes and plug straight into display_route_results / generate_map.
+"""
+
+import hashlib
+import os
+import time
+from array import array
+
+from algorithms import (
+    CAR_SPEED_PROFILE, INF, RUSH_HOUR_MULTIPLIERS,
+    get_edge_costs, traffic_profile
+)
+from graph_snapshot import read_snapshot, write_snapshot
+from structures import MinHeap
+
+HIERARCHY_FILE = "graph.{mode}.{profile}.hierarchy"
+WITNESS_SETTLE_LIMIT = 60   # Witness searches give up after this many nodes (extra shortcuts are harmless)
+
+
+class ContractionHierarchy:
+    """
+    Upward graph of one (mode, traffic profile) pair, in CSR form over dense node indices:
+      out_*: edges u -> w with rank[w] > rank[u], used by the forward search
+      in_* : edges u -> w with rank[u] > rank[w], stored at w, used by the backward search
+    *_mids holds the bypassed node of a shortcut, -1 for an original road edge.
+    """
+    def __init__(self, rank, out_offsets, out_targets, out_costs, out_mids,
+                 in_offsets, in_sources, in_costs, in_mids):
+        self.rank = rank
+        self.out_offsets, self.out_targets = out_offsets, out_targets
+        self.out_costs, self.out_mids = out_costs, out_mids
+        self.in_offsets, self.in_sources = in_offsets, in_sources
+        self.in_costs, self.in_mids = in_costs, in_mids
+
+    #  PREPROCESSING
+    @classmethod
+    def build(cls, graph, mode='car', profile='normal'):
+        """Contract every node of graph using the (mode, profile) edge cost table."""
+        n_nodes = len(graph.node_ids)
+        costs = get_edge_costs(graph, mode, profile)
+        offsets, targets = graph.csr_offsets, graph.csr_targets
+
+        # Remaining ("core") graph as dicts, parallel edges collapsed to the cheapest
+        out_edges = [{} for _ in range(n_nodes)]
+        in_edges = [{} for _ in range(n_nodes)]
+        for u in range(n_nodes):
+            for e in range(offsets[u], offsets[u + 1]):
+                v = targets[e]
+                if costs[e] == INF or v == u:
+                    continue
+                if costs[e] < out_edges[u].get(v, INF):
+                    out_edges[u][v] = costs[e]
+                    in_edges[v][u] = costs[e]
+        shortcut_mid = {}
+
+        def witness_distances(source, skip, limit):
+            """Bounded Dijkstra from source in the core graph, avoiding node skip."""
+            dist = {source: 0}
+            heap = MinHeap()
+            heap.push((0, source))
+            settled = 0
+            while not heap.is_empty():
+                d, x = heap.pop()
+                if d > dist[x]:
+                    continue
+                settled += 1
+                if d > limit or settled > WITNESS_SETTLE_LIMIT:
+                    break
+                for y, c in out_edges[x].items():
+                    if y != skip and d + c < dist.get(y, INF):
+                        dist[y] = d + c
+                        heap.push((d + c, y))
+            return dist
+
+        def needed_shortcuts(v):
+            """Shortcuts (u, w, cost) that contracting v would require."""
+            shortcuts = []
+            outs = out_edges[v]
+            for u, cost_in in in_edges[v].items():
+                limit = cost_in + max((c for w, c in outs.items() if w != u), default=-INF)
+                if limit < 0:
+                    continue
+                dist = witness_distances(u, v, limit)
+                for w, cost_out in outs.items():
+                    if w != u and dist.get(w, INF) > cost_in + cost_out:
+                        shortcuts.append((u, w, cost_in + cost_out))
+            return shortcuts
+
+        deleted_neighbors = [0] * n_nodes
+
+        def priority(v, shortcuts):
+            return len(shortcuts) - len(in_edges[v]) - len(out_edges[v]) + deleted_neighbors[v]
+
+        queue = MinHeap()
+        for v in range(n_nodes):
+            queue.push((priority(v, needed_shortcuts(v)), v))
+
+        rank = array('i', [-1]) * n_nodes
+        up_out = [None] * n_nodes
+        up_in = [None] * n_nodes
+        next_rank = 0
+        while not queue.is_empty():
+            _, v = queue.pop()
+            # Lazy update: re-evaluate and only contract if v is still the cheapest
+            shortcuts = needed_shortcuts(v)
+            current = priority(v, shortcuts)
+            if not queue.is_empty() and current > queue.peek()[0]:
+                queue.push((current, v))
+                continue
+
+            rank[v] = next_rank
+            next_rank += 1
+            if next_rank % max(1, n_nodes // 10) == 0:
+                print(f"   ... {100 * next_rank // n_nodes}% of nodes contracted")
+            up_out[v] = [(w, c, shortcut_mid.get((v, w), -1)) for w, c in out_edges[v].items()]
+            up_in[v] = [(u, c, shortcut_mid.get((u, v), -1)) for u, c in in_edges[v].items()]
+
+            for w in out_edges[v]:
+                del in_edges[w][v]
+                deleted_neighbors[w] += 1
+            for u in in_edges[v]:
+                del out_edges[u][v]
+                deleted_neighbors[u] += 1
+            for u, w, cost in shortcuts:
+                if cost < out_edges[u].get(w, INF):
+                    out_edges[u][w] = cost
+                    in_edges[w][u] = cost
+                    shortcut_mid[(u, w)] = v
+            out_edges[v] = in_edges[v] = None
+
+        return cls(rank, *_to_csr(up_out), *_to_csr(up_in))
+
+    #  PERSISTENCE
+    def save(self, path, key):
+        write_snapshot(path, key, {
+            'rank': self.rank,
+            'out_offsets': self.out_offsets, 'out_targets': self.out_targets,
+            'out_costs': self.out_costs, 'out_mids': self.out_mids,
+            'in_offsets': self.in_offsets, 'in_sources': self.in_sources,
+            'in_costs': self.in_costs, 'in_mids': self.in_mids,
+        })
+
+    @classmethod
+    def load(cls, path, key):
+        """Hierarchy from path, or None if missing or built for other data."""
+        sections = read_snapshot(path, key)
+        if sections is None:
+            return None
+        return cls(sections['rank'],
+                   sections['out_offsets'], sections['out_targets'], sections['out_costs'], sections['out_mids'],
+                   sections['in_offsets'], sections['in_sources'], sections['in_costs'], sections['in_mids'])
+
+    #  QUERY
+    def query(self, source, target, queue=None):
+        """
+        Shortest path between dense indices as
+        (node index list, cost, settled count, heap operations).
+        Returns (None, inf, settled, heap operations) when target is unreachable.
+        queue: priority queue class for both upward searches (MinHeap by default).
+        """
+        if source == target:
+            return [source], 0, 0, 0
+
+        dist_f, dist_b = {source: 0}, {target: 0}
+        parent_f, parent_b = {source: None}, {target: None}
+        open_f, open_b = (queue or MinHeap)(), (queue or MinHeap)()
+        open_f.push((0, source))
+        open_b.push((0, target))
+        best_cost, meeting, settled = INF, -1, 0
+        heap_operations = 2  # Initial pushes
+
+        while True:
+            top_f = open_f.peek()[0] if not open_f.is_empty() else INF
+            top_b = open_b.peek()[0] if not open_b.is_empty() else INF
+            # Each side can stop once it cannot improve on the best meeting point
+            if min(top_f, top_b) >= best_cost:
+                break
+
+            forward = top_f <= top_b
+            heap, dist, other, parent = (open_f, dist_f, dist_b, parent_f) if forward else (open_b, dist_b, dist_f, parent_b)
+            offsets = self.out_offsets if forward else self.in_offsets
+            ends = self.out_targets if forward else self.in_sources
+            costs = self.out_costs if forward else self.in_costs
+
+            d, x = heap.pop()
+            heap_operations += 1
+            if d > dist[x]:
+                continue  # Stale entry
+            settled += 1
+            if x in other and d + other[x] < best_cost:
+                best_cost, meeting = d + other[x], x
+            for slot in range(offsets[x], offsets[x + 1]):
+                y = ends[slot]
+                if d + costs[slot] < dist.get(y, INF):
+                    dist[y] = d + costs[slot]
+                    parent[y] = (x, slot)
+                    heap.push((dist[y], y))
+                    heap_operations += 1
+
+        if meeting == -1:
+            return None, INF, settled, heap_operations
+
+        # Upward edges source -> meeting, then meeting -> target
+        forward_edges = []
+        node = meeting
+        while parent_f[node] is not None:
+            prev, slot = parent_f[node]
+            forward_edges.append((prev, node, self.out_mids[slot]))
+            node = prev
+        forward_edges.reverse()
+        backward_edges = []
+        node = meeting
+        while parent_b[node] is not None:
+            nxt, slot = parent_b[node]
+            backward_edges.append((node, nxt, self.in_mids[slot]))
+            node = nxt
+
+        path = [source]
+        for a, b, mid in forward_edges + backward_edges:
+            path.extend(self._unpack(a, b, mid))
+        return path, best_cost, settled, heap_operations
+
+    def _edge_mid(self, a, b):
+        """Bypassed node of the hierarchy edge a -> b."""
+        if self.rank[a] < self.rank[b]:
+            for slot in range(self.out_offsets[a], self.out_offsets[a + 1]):
+                if self.out_targets[slot] == b:
+                    return self.out_mids[slot]
+        else:
+            for slot in range(self.in_offsets[b], self.in_offsets[b + 1]):
+                if self.in_sources[slot] == a:
+                    return self.in_mids[slot]
+        return -1
+
+    def _unpack(self, a, b, mid):
+        """Original nodes after a along the (possibly shortcut) edge a -> b."""
+        nodes = []
+        stack = [(a, b, mid)]
+        while stack:
+            u, w, m = stack.pop()
+            if m == -1:
+                nodes.append(w)
+            else:
+                # Push the second half first so the first half is expanded first
+                stack.append((m, w, self._edge_mid(m, w)))
+                stack.append((u, m, self._edge_mid(u, m)))
+        return nodes
+
+
+def _to_csr(edge_lists):
+    """[(end, cost, mid), ...] per node -> (offsets, ends, costs, mids) arrays."""
+    offsets = array('q', [0])
+    ends, costs, mids = array('i'), array('d'), array('i')
+    for edges in edge_lists:
+        for end, cost, mid in edges or ():
+            ends.append(end)
+            costs.append(cost)
+            mids.append(mid)
+        offsets.append(len(ends))
+    return offsets, ends, costs, mids
+
+
+def _cache_key(graph, mode, profile):
+    """Hierarchy files are only valid for the same graph data and cost model."""
+    digest = hashlib.sha256(graph.source_checksum)
+    digest.update(f"{mode}/{profile}".encode('utf-8'))
+    digest.update(repr(sorted(CAR_SPEED_PROFILE.items())).encode('utf-8'))
+    digest.update(repr(sorted(RUSH_HOUR_MULTIPLIERS.items())).encode('utf-8'))
+    return digest.digest()
+
+
+def load_or_build_hierarchy(graph, mode='car', profile='normal'):
+    """
+    Hierarchy for (mode, profile), cached on the graph, read from the file next to
+    the graph snapshot when present, and built (then saved) otherwise.
+    """
+    profile = 'normal' if mode == 'walk' else profile
+    cached = graph.hierarchies.get((mode, profile))
+    if cached is not None:
+        return cached
+
+    path = None
+    if graph.snapshot_file and graph.source_checksum:
+        path = os.path.join(os.path.dirname(graph.snapshot_file), HIERARCHY_FILE.format(mode=mode, profile=profile))
+        key = _cache_key(graph, mode, profile)
+        hierarchy = ContractionHierarchy.load(path, key)
+        if hierarchy is not None:
+            graph.hierarchies[(mode, profile)] = hierarchy
+            return hierarchy
+
+    print(f" Building {mode} contraction hierarchy ({profile} traffic). This takes about a minute,")
+    print("   once per dataset; the result is saved next to the graph snapshot.")
+    hierarchy = ContractionHierarchy.build(graph, mode, profile)
+    if path:
+        try:
+            hierarchy.save(path, key)
+        except OSError as e:
+            print(f"  Could not write contraction hierarchy: {e}")
+    graph.hierarchies[(mode, profile)] = hierarchy
+    return hierarchy
+
+
+def ch_search(graph, start_id, end_id, mode='car', return_stats=False, queue=None):
+    """
+    Point-to-point query on the contraction hierarchy for mode and the graph's
+    current traffic profile (built on first use).
+    queue: priority queue class (see algorithms.a_star_search).
+    Returns: (path, cost) or (path, cost, stats) if return_stats=True
+    """
+    start_time = time.time()
+    start = graph.to_index(start_id) if start_id is not None else None
+    goal = graph.to_index(end_id) if end_id is not None else None
+    if start is None or goal is None:
+        if return_stats:
+            return None, float('inf'), {'algorithm_name': 'Contraction Hierarchies', 'nodes_explored': 0, 'heap_operations': 0, 'time_ms': 0}
+        return None, float('inf')
+
+    hierarchy = load_or_build_hierarchy(graph, mode, traffic_profile(graph))
+    query_start = time.time()
+    indices, cost, settled, heap_operations = hierarchy.query(start, goal, queue)
+    path = [graph.node_ids[i] for i in indices] if indices else None
+
+    stats = {
+        'algorithm_name': 'Contraction Hierarchies',
+        'nodes_explored': settled,
+        'heap_operations': heap_operations,
+        'time_ms': (time.time() - query_start) * 1000,
+        'total_time_ms': (time.time() - start_time) * 1000
+    }
+    if return_stats:
+        return path, cost, stats
+    return path, cost
@@ -0,0 +1,156 @@
+"""
+Binary Graph Snapshot
+Compiles the parsed road network into flat typed arrays and stores them
+in a single versioned file so later launches skip the JSON parse.
+
+File layout (native byte order, every section 8-byte aligned):
+    header   : magic, format version, byte order flag, source checksum, section count
+    table    : (name, typecode, offset, count) for every section
+    sections : raw array bytes
+"""
+
+import array
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_MAGIC = b'NUSTSNAP'
+
+_HEADER = struct.Struct('=8sIB3x32sI')
+_SECTION = struct.Struct('=16sc7xQQ')
+_ALIGN = 8
+
+# Edge flag bits stored in the 'flags' section
+FLAG_WALK = 1
+FLAG_DRIVE = 2
+
+
+def source_checksum(paths):
+    """SHA-256 over the contents of the source files, in order."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        digest.update(b'\0')  # Keep file boundaries significant
+    return digest.digest()
+
+
+def pack_strings(strings):
+    """Pack a list of strings into (utf-8 blob, offsets) arrays."""
+    blob = bytearray()
+    offsets = array.array('q', [0])
+    for s in strings:
+        blob.extend(s.encode('utf-8'))
+        offsets.append(len(blob))
+    return array.array('B', blob), offsets
+
+
+def unpack_strings(blob, offsets):
+    """Inverse of pack_strings."""
+    raw = bytes(blob)
+    return [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+
+def _padding(position):
+    return (-position) % _ALIGN
+
+
+def write_snapshot(path, checksum, sections):
+    """
+    Write a dict of {name: array.array} to path.
+    The file is written to a temp name first so readers never see a partial snapshot.
+    """
+    names = list(sections)
+    table_end = _HEADER.size + _SECTION.size * len(names)
+    position = table_end + _padding(table_end)
+
+    entries = []
+    for name in names:
+        data = sections[name]
+        entries.append((name, data.typecode, position, len(data)))
+        position += len(data) * data.itemsize
+        position += _padding(position)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+                             1 if sys.byteorder == 'little' else 0,
+                             checksum, len(names)))
+        for name, typecode, offset, count in entries:
+            f.write(_SECTION.pack(name.encode('ascii'), typecode.encode('ascii'), offset, count))
+        for name, _, offset, _ in entries:
+            f.write(b'\0' * (offset - f.tell()))
+            sections[name].tofile(f)
+    os.replace(tmp_path, path)
+
+
+def _read_table(buffer, checksum):
+    """Validate the header and return the section table, or None if stale."""
+    if len(buffer) < _HEADER.size:
+        return None
+    magic, version, little, stored_checksum, count = _HEADER.unpack_from(buffer, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        return None
+    if bool(little) != (sys.byteorder == 'little'):
+        return None
+    if stored_checksum != checksum:
+        return None
+
+    table = {}
+    for i in range(count):
+        name, typecode, offset, length = _SECTION.unpack_from(buffer, _HEADER.size + i * _SECTION.size)
+        table[name.rstrip(b'\0').decode('ascii')] = (typecode.decode('ascii'), offset, length)
+    return table
+
+
+def read_snapshot(path, checksum):
+    """
+    Load every section of a snapshot into in-memory arrays.
+    Returns None when the file is missing, from another format version,
+    or was built from different source data.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        buffer = f.read()
+
+    table = _read_table(buffer, checksum)
+    if table is None:
+        return None
+
+    sections = {}
+    for name, (typecode, offset, length) in table.items():
+        data = array.array(typecode)
+        data.frombytes(buffer[offset:offset + length * data.itemsize])
+        sections[name] = data
+    return sections
+
+
+def map_snapshot(path, checksum):
+    """
+    Memory-map a snapshot instead of copying it.
+    Sections come back as memoryviews cast to their typecode, so every process
+    mapping the same file shares one physical copy through the page cache.
+    The mapping is copy-on-write: a process that edits a value gets a private
+    page and never touches the file or other processes.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    table = _read_table(mapped, checksum)
+    if table is None:
+        mapped.close()
+        return None
+
+    view = memoryview(mapped)
+    sections = {}
+    for name, (typecode, offset, length) in table.items():
+        itemsize = struct.calcsize(typecode)
+        sections[name] = view[offset:offset + length * itemsize].cast(typecode)
+    return sections
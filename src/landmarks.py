@@ -0,0 +1,196 @@
+"""
+ALT Landmark Heuristic
+Precomputes travel times from and to a ring of landmarks around the map so A*
+can bound the remaining time with the triangle inequality:
+    d(v, t) >= d(L, t) - d(L, v)      and      d(v, t) >= d(v, L) - d(t, L)
+which is far tighter than straight-line distance / MAX_CAR_SPEED on slow roads.
+
+Tables are built on the normal traffic profile. Rush hour and route penalties only
+ever make edges slower, so the bounds stay admissible for them too.
+"""
+
+import hashlib
+import math
+import os
+from array import array
+
+from algorithms import (
+    CAR_SPEED_PROFILE, INF, METERS_PER_DEG_LAT, METERS_PER_DEG_LON,
+    get_edge_costs, straight_line_heuristic
+)
+from graph_snapshot import read_snapshot, write_snapshot
+from structures import MinHeap
+
+LANDMARK_FILE = "graph.landmarks"
+DEFAULT_LANDMARKS = 16
+ACTIVE_LANDMARKS = 4   # Landmarks consulted per query (best bounds for that start/goal)
+UNREACHABLE = 1e9      # Finite stand-in for inf so bound arithmetic never gives nan
+MODES = ('car', 'walk')
+
+
+def dijkstra_all(graph, source, costs, reverse=False, queue=None):
+    """
+    Travel time from dense node source to every node, or from every node to
+    source when reverse=True. Unreachable nodes get UNREACHABLE.
+    queue: priority queue class (MinHeap by default, see a_star_search).
+    """
+    if reverse:
+        offsets, neighbors, edge_ids = graph.reverse_adjacency()
+    else:
+        offsets, neighbors, edge_ids = graph.csr_offsets, graph.csr_targets, None
+
+    dist = array('d', [UNREACHABLE]) * len(graph.node_ids)
+    dist[source] = 0
+    heap = (queue or MinHeap)()
+    heap.push((0, source))
+
+    while not heap.is_empty():
+        d, u = heap.pop()
+        if d > dist[u]:
+            continue  # Stale entry
+        for slot in range(offsets[u], offsets[u + 1]):
+            edge_cost = costs[edge_ids[slot] if reverse else slot]
+            if edge_cost == INF:
+                continue
+            v = neighbors[slot]
+            if d + edge_cost < dist[v]:
+                dist[v] = d + edge_cost
+                heap.push((dist[v], v))
+    return dist
+
+
+def select_landmarks(graph, mode, count=DEFAULT_LANDMARKS):
+    """
+    Pick up to count landmarks on the edge of the map: split the plane around the
+    network's centre into count angular sectors and take the farthest node in each.
+    Only nodes reachable from the centre qualify, so no landmark lands on an island.
+    """
+    pool = sorted(graph.node_index[n] for n in (graph.drive_nodes if mode == 'car' else graph.walk_nodes))
+    if not pool:
+        return []
+    lat, lon = graph.lat, graph.lon
+    center_lat = sum(lat[i] for i in pool) / len(pool)
+    center_lon = sum(lon[i] for i in pool) / len(pool)
+
+    def offset(i):
+        return (lat[i] - center_lat) * METERS_PER_DEG_LAT, (lon[i] - center_lon) * METERS_PER_DEG_LON
+
+    hub = min(pool, key=lambda i: math.hypot(*offset(i)))
+    reach = dijkstra_all(graph, hub, get_edge_costs(graph, mode, 'normal'))
+
+    farthest = {}
+    for i in pool:
+        if reach[i] >= UNREACHABLE:
+            continue
+        dy, dx = offset(i)
+        sector = int((math.atan2(dy, dx) + math.pi) / (2 * math.pi) * count) % count
+        radius = dx * dx + dy * dy
+        if sector not in farthest or radius > farthest[sector][0]:
+            farthest[sector] = (radius, i)
+    return [farthest[sector][1] for sector in sorted(farthest)]
+
+
+class Landmarks:
+    """
+    Per-mode landmark tables: mode -> (landmark indices, [d(L, v) arrays], [d(v, L) arrays]).
+    An instance is an A* heuristic factory, so it can be passed as heuristic= or
+    stored on graph.landmarks to become the default.
+    """
+    def __init__(self, tables):
+        self.tables = tables
+
+    def __call__(self, graph, source, goal, mode='car'):
+        fallback = straight_line_heuristic(graph, source, goal, mode)
+        if mode not in self.tables:
+            return fallback
+
+        landmark_ids, dist_from, dist_to = self.tables[mode]
+        # Keep only the landmarks that bound this particular query best
+        ranked = sorted(
+            range(len(landmark_ids)),
+            key=lambda k: max(dist_from[k][goal] - dist_from[k][source], dist_to[k][source] - dist_to[k][goal]),
+            reverse=True
+        )
+        active = [(dist_from[k], dist_from[k][goal], dist_to[k], dist_to[k][goal]) for k in ranked[:ACTIVE_LANDMARKS]]
+
+        def estimate(i):
+            best = fallback(i)
+            for d_from, from_goal, d_to, to_goal in active:
+                bound = from_goal - d_from[i]
+                if bound > best:
+                    best = bound
+                bound = d_to[i] - to_goal
+                if bound > best:
+                    best = bound
+            return best
+        return estimate
+
+
+def build_landmarks(graph, count=DEFAULT_LANDMARKS):
+    """Select landmarks and compute forward/backward travel times for every mode."""
+    tables = {}
+    for mode in MODES:
+        costs = get_edge_costs(graph, mode, 'normal')
+        landmark_ids = select_landmarks(graph, mode, count)
+        print(f"  Computing {len(landmark_ids)} {mode} landmarks...")
+        dist_from = [dijkstra_all(graph, landmark, costs) for landmark in landmark_ids]
+        dist_to = [dijkstra_all(graph, landmark, costs, reverse=True) for landmark in landmark_ids]
+        tables[mode] = (landmark_ids, dist_from, dist_to)
+    return Landmarks(tables)
+
+
+def _cache_key(graph, count):
+    """Landmark files are only valid for the same graph data, speed profile and landmark count."""
+    digest = hashlib.sha256(graph.source_checksum)
+    digest.update(repr(sorted(CAR_SPEED_PROFILE.items())).encode('utf-8'))
+    digest.update(str(count).encode('utf-8'))
+    return digest.digest()
+
+
+def save_landmarks(landmarks, path, key):
+    sections = {}
+    for mode, (landmark_ids, dist_from, dist_to) in landmarks.tables.items():
+        sections[f'{mode}_ids'] = array('i', landmark_ids)
+        sections[f'{mode}_from'] = sum(dist_from, array('d'))
+        sections[f'{mode}_to'] = sum(dist_to, array('d'))
+    write_snapshot(path, key, sections)
+
+
+def load_landmarks(path, key, n_nodes):
+    """Landmarks from path, or None if missing or built for other data."""
+    sections = read_snapshot(path, key)
+    if sections is None:
+        return None
+    tables = {}
+    for mode in MODES:
+        if f'{mode}_ids' not in sections:
+            continue
+        landmark_ids = list(sections[f'{mode}_ids'])
+        split = lambda flat: [flat[k * n_nodes:(k + 1) * n_nodes] for k in range(len(landmark_ids))]
+        tables[mode] = (landmark_ids, split(sections[f'{mode}_from']), split(sections[f'{mode}_to']))
+    return Landmarks(tables)
+
+
+def load_or_build_landmarks(graph, count=DEFAULT_LANDMARKS):
+    """
+    Landmarks for graph, read from the file next to its snapshot when present and
+    computed (then saved) otherwise. Without a snapshot they are kept in memory only.
+    """
+    path = None
+    if graph.snapshot_file and graph.source_checksum:
+        path = os.path.join(os.path.dirname(graph.snapshot_file), LANDMARK_FILE)
+        key = _cache_key(graph, count)
+        landmarks = load_landmarks(path, key, len(graph.node_ids))
+        if landmarks is not None:
+            print(f" Loaded landmark tables ({LANDMARK_FILE})")
+            return landmarks
+
+    print("🧭 Precomputing landmark heuristic (one time per dataset)...")
+    landmarks = build_landmarks(graph, count)
+    if path:
+        try:
+            save_landmarks(landmarks, path, key)
+            print(f" Wrote landmark tables ({LANDMARK_FILE})")
+        except OSError as e:
+            print(f"  Could not write landmark tables: {e}")
+    return landmarks
@@ -1,13 +1,17 @@
 from structures import CityGraph, merge_sort
 from algorithms import (
     a_star_search, 
-    get_k_shortest_paths, 
+    get_alternative_routes, 
     simulate_traffic, 
     reset_traffic,
     bfs_search,
     get_distance_meters,
-    optimize_route_order
+    optimize_route_order,
+    bidirectional_a_star
 )
+from contraction import ch_search
+from overlay import crp_search, customize_overlay
+from landmarks import load_or_build_landmarks
 from visualizer import generate_map
 from history_manager import log_trip, get_history, get_frequent_destinations
 import os
@@ -379,6 +383,8 @@ def display_route_results(path, mode, time_cost, start_name, end_name, algo_stat
         print("\n" + "-"*40)
         print(f"  📊 Algorithm: {algo_stats.get('algorithm_name', 'Unknown')}")
         print(f"  🔍 Nodes Explored: {algo_stats.get('nodes_explored', 0):,}")
+        if 'nodes_explored_forward' in algo_stats:
+            print(f"     ↳ Forward: {algo_stats['nodes_explored_forward']:,} | Backward: {algo_stats['nodes_explored_backward']:,}")
         if algo_stats.get('heap_operations', 0) > 0:
             print(f"  📦 Heap Operations: {algo_stats.get('heap_operations', 0):,}")
         print(f"  ⏱️  Compute Time: {algo_stats.get('time_ms', 0):.1f} ms")
@@ -452,7 +458,10 @@ def route_selection_menu():
     print("\nSelect Routing Algorithm:")
     print("  1. Fastest Route (A*)")
     print("  2. Simplest Route (Fewest Turns - BFS)")
-    print("  3. K-Shortest Paths (3 Alternatives)")
+    print("  3. Alternative Routes (up to 3)")
+    print("  4. Fastest Route (Bidirectional A*)")
+    print("  5. Fastest Route (Contraction Hierarchies)")
+    print("  6. Fastest Route (Traffic-Aware Overlay)")
     print("  0. Back")
     
     choice = input("Enter choice: ")
@@ -489,7 +498,13 @@ def route_selection_menu():
     # For A* (choice == '1'):
     if choice == '1':
         print(f" Calculating Fastest {mode.upper()} Route...")
-        path, time_cost, algo_stats = a_star_search(city, start_id, end_id, mode=mode, return_stats=True)
+        # Start and end exactly at the locations, part way along their roads
+        start_point = city.snap_to_edge(start_lat, start_lon, mode=mode) or start_id
+        end_point = city.snap_to_edge(end_lat, end_lon, mode=mode) or end_id
+        path, time_cost, algo_stats = a_star_search(city, start_point, end_point, mode=mode, return_stats=True)
+        if path and len(path) < 2:
+            # Both points next to the same junction: nothing to draw, use the node route instead
+            path, time_cost, algo_stats = a_star_search(city, start_id, end_id, mode=mode, return_stats=True)
         display_route_results(path, mode, time_cost, start_name, end_name, algo_stats=algo_stats)
 
     # For BFS (choice == '2'):
@@ -508,10 +523,10 @@ def route_selection_menu():
         else:
             print("Error: No path found.")
 
-    # For K-shortest (choice == '3'):
+    # For alternative routes (choice == '3'):
     elif choice == '3':
         print(f" Calculating {mode.upper()} routes...")
-        paths_found = get_k_shortest_paths(city, start_id, end_id, k=3, mode=mode)
+        paths_found, algo_stats = get_alternative_routes(city, start_id, end_id, k=3, mode=mode, return_stats=True)
 
         if not paths_found:
             print("Error: No path found.")
@@ -527,11 +542,26 @@ def route_selection_menu():
             path = paths_found[0][0]
             time_cost = paths_found[0][1]
             
-            # Get stats for primary route
-            _, _, algo_stats = a_star_search(city, start_id, end_id, mode=mode, return_stats=True)
-            
             display_route_results(path, mode, time_cost, start_name, end_name, 
                                 algo_stats=algo_stats, alternatives=paths_found)
+
+    # For Bidirectional A* (choice == '4'):
+    elif choice == '4':
+        print(f" Calculating Fastest {mode.upper()} Route (Bidirectional)...")
+        path, time_cost, algo_stats = bidirectional_a_star(city, start_id, end_id, mode=mode, return_stats=True)
+        display_route_results(path, mode, time_cost, start_name, end_name, algo_stats=algo_stats)
+
+    # For Contraction Hierarchies (choice == '5'):
+    elif choice == '5':
+        print(f" Calculating Fastest {mode.upper()} Route (Contraction Hierarchies)...")
+        path, time_cost, algo_stats = ch_search(city, start_id, end_id, mode=mode, return_stats=True)
+        display_route_results(path, mode, time_cost, start_name, end_name, algo_stats=algo_stats)
+
+    # For the partition overlay (choice == '6'):
+    elif choice == '6':
+        print(f" Calculating Fastest {mode.upper()} Route (Overlay)...")
+        path, time_cost, algo_stats = crp_search(city, start_id, end_id, mode=mode, return_stats=True)
+        display_route_results(path, mode, time_cost, start_name, end_name, algo_stats=algo_stats)
     
     input("\nPress Enter to return...")
     go_back()
@@ -554,11 +584,11 @@ def multi_stop_route_menu():
     mode = 'walk' if m_choice == '1' else 'car'
     
     # Get number of stops
-    print("\nHow many stops do you want to visit? (Recommended: 2-5)")
+    print("\nHow many stops do you want to visit? (Exact up to 16, heuristic up to 50)")
     try:
         num_stops = int(input("Number of stops: "))
-        if num_stops < 2 or num_stops > 6:
-            print("  Please choose between 2-6 stops for optimal performance")
+        if num_stops < 2 or num_stops > 50:
+            print("  Please choose between 2-50 stops for optimal performance")
             input("Press Enter to return...")
             return go_back()
     except ValueError:
@@ -588,16 +618,14 @@ def multi_stop_route_menu():
     
     # Snap all locations to graph nodes
     print(f"\n Snapping locations to {mode} roads...")
-    start_id = city.find_nearest_node(start_lat, start_lon, mode=mode)
-    stop_ids = []
-    
-    for stop_lat, stop_lon, stop_name in stops_info:
-        stop_id = city.find_nearest_node(stop_lat, stop_lon, mode=mode)
-        stop_ids.append(stop_id)
+    snapped, _ = city.snap_many([(start_lat, start_lon)] + [(lat, lon) for lat, lon, _ in stops_info], mode=mode)
+    start_id, stop_ids = snapped[0], snapped[1:]
     
     # Run TSP optimization
     print(f" Optimizing route order for {num_stops} stops...")
-    best_order, total_cost, segments, algo_stats = optimize_route_order(city, start_id, stop_ids, mode)
+    # Leg searches are independent, so larger requests spread them over the available cores
+    # (below PARALLEL_MIN_SWEEPS searches they stay in this process)
+    best_order, total_cost, segments, algo_stats = optimize_route_order(city, start_id, stop_ids, mode, workers=os.cpu_count() or 1)
     
     if not best_order:
         print(" Could not find valid route")
@@ -735,6 +763,11 @@ def toggle_traffic():
             rush_hour_active = False
             traffic_mods = []
             print("\n    Rush Hour Mode DEACTIVATED")
+        # Routing overlay only re-customizes cells whose travel times changed
+        if city.overlay is not None:
+            start = time.time()
+            redone = customize_overlay(city, 'car')
+            print(f"    Overlay updated in {(time.time() - start) * 1000:.0f} ms ({redone} cells re-customized)")
         input("\n   Press Enter to continue...")
         toggle_traffic()
     elif choice == '2':
@@ -1216,6 +1249,12 @@ def main():
         print(f"Error loading data: {e}")
         return
     
+    # Landmark tables tighten the A* heuristic; routing still works without them
+    try:
+        city.landmarks = load_or_build_landmarks(city)
+    except Exception as e:
+        print(f"  Landmark heuristic unavailable ({e}), using straight-line estimates")
+    
     if not city.pois:
         print("CRITICAL: No POIs loaded. Run data_pipeline.py first!")
         return
@@ -1,18 +1,66 @@
+import bisect
+import hashlib
 import json
+import math
+import os
+import struct
+from array import array
+from collections.abc import Mapping
+
+import numpy as np
+
+from graph_snapshot import (
+    FLAG_DRIVE, FLAG_WALK, source_checksum, pack_strings, unpack_strings,
+    read_snapshot, map_snapshot, write_snapshot
+)
+
+SNAPSHOT_FILE = "graph.snapshot"
+POI_SNAP_FILE = "pois.snap"    # POI drive/walk nodes and search trie, next to the graph snapshot
+# Road types find_nearest_node prefers when several nodes are about equally close
+CAMPUS_ROAD_TYPES = ('service', 'residential', 'living_street')
+# Squared-degree search radii for node snapping, tightest first
+# 0.00001 ~= 1m, 0.0001 ~= 10m, 0.001 ~= 100m, 0.01 ~= 1km, 0.1 ~= 10km
+SNAP_RADII = (0.00001, 0.0001, 0.001, 0.01, 0.1)
+SNAP_CANDIDATES = 5
 
 #  TRIE DATA STRUCTURE (Usman) 
 class TrieNode:
-    """Node in the Trie structure for efficient prefix searching."""
-    def __init__(self):
-        self.children = {}
-        self.is_end_of_word = False
-        self.poi_data = None
+    """
+    Node of the compressed (radix) trie: label is the text on the edge into it.
+    Children are array-backed: keys holds their first characters as one string and
+    children the nodes in the same order, both in insertion order.
+    """
+    __slots__ = ('label', 'keys', 'children', 'entry', 'top')
+    
+    def __init__(self, label=''):
+        self.label = label
+        self.keys = ''
+        self.children = []
+        self.entry = -1   # Position in Trie.all_words of the word ending here, -1 if none
+        self.top = ()     # all_words positions of the best-ranked words below, see Trie._rank
 
 class Trie:
-    """Trie data structure for autocomplete suggestions."""
-    def __init__(self):
+    """
+    Trie data structure for autocomplete suggestions, stored as a radix trie
+    (chains of single-child nodes are merged into one labelled edge).
+    Every node keeps the top_k best words of its subtree, so a prefix lookup is a
+    walk down the prefix and nothing more. Ranking is by score(poi_data) (lower is
+    better, e.g. a POI type priority) and then depth-first order; without a score
+    it is plain depth-first order. The lists are rebuilt on the first lookup after
+    an insert. to_sections/from_sections flatten the trie for the POI cache file.
+    """
+    def __init__(self, top_k=10, score=None):
         self.root = TrieNode()
         self.all_words = []  # Store all words for fuzzy matching
+        self.fuzzy_index = FuzzyIndex(self.all_words)
+        self.top_k = top_k
+        self.score = score
+        self.ranked = True
+    
+    def set_score(self, score):
+        """Rank suggestions by score(poi_data) from now on (None: depth-first order)."""
+        self.score = score
+        self.ranked = False
     
     def insert(self, word, poi_data=None):
         """Insert a word into the Trie."""
@@ -21,67 +69,170 @@ class Trie:
         
         # Store for fuzzy matching
         self.all_words.append({'word': word_lower, 'data': poi_data})
+        self.fuzzy_index.clear()
+        self.ranked = False
         
-        for char in word_lower:
-            if char not in node.children:
-                node.children[char] = TrieNode()
-            node = node.children[char]
+        rest = word_lower
+        while rest:
+            slot = node.keys.find(rest[0])
+            if slot == -1:
+                child = TrieNode(rest)
+                node.keys += rest[0]
+                node.children.append(child)
+                node = child
+                break
+            
+            child = node.children[slot]
+            label = child.label
+            common = 1
+            while common < len(label) and common < len(rest) and label[common] == rest[common]:
+                common += 1
+            if common < len(label):
+                # The word leaves this edge part way: split it at the branch point
+                middle = TrieNode(label[:common])
+                middle.keys = label[common]
+                middle.children.append(child)
+                child.label = label[common:]
+                node.children[slot] = middle
+                child = middle
+            node = child
+            rest = rest[common:]
         
-        node.is_end_of_word = True
-        node.poi_data = poi_data
+        node.entry = len(self.all_words) - 1
     
     def search_prefix(self, prefix):
         """Find all words with given prefix."""
         prefix = prefix.lower()
         node = self.root
         
-        for char in prefix:
-            if char not in node.children:
+        rest = prefix
+        while rest:
+            slot = node.keys.find(rest[0])
+            if slot == -1:
                 # No exact prefix match so try fuzzy search
                 return self._fuzzy_search(prefix)
-            node = node.children[char]
+            node = node.children[slot]
+            if node.label.startswith(rest):
+                break  # Prefix ends on this edge: same subtree
+            if not rest.startswith(node.label):
+                return self._fuzzy_search(prefix)
+            rest = rest[len(node.label):]
         
-        suggestions = []
-        self._collect_words(node, prefix, suggestions)
-        return suggestions[:10]
+        if not self.ranked:
+            self._rank()
+        words = self.all_words
+        return [{'name': words[i]['word'], 'data': words[i]['data']} for i in node.top]
+    
+    def _rank(self):
+        """
+        Fill every node's top list with the all_words positions of the top_k best
+        words below it. One depth-first pass ranks the words, a second (children
+        before parents) merges each node's own word with its children's lists.
+        """
+        score, top_k, words = self.score, self.top_k, self.all_words
+        rank = {}
+        visit_order = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            visit_order.append(node)
+            if node.entry != -1:
+                position = len(visit_order)
+                rank[node.entry] = (position,) if score is None else (score(words[node.entry]['data']), position)
+            # Reversed so children come off the stack in insertion order
+            stack.extend(reversed(node.children))
+        
+        for node in reversed(visit_order):
+            merged = [node.entry] if node.entry != -1 else []
+            for child in node.children:
+                merged.extend(child.top)
+            if score is not None:
+                merged.sort(key=rank.__getitem__)   # Pre-order concatenation is already depth-first order
+            node.top = tuple(merged[:top_k])
+        self.ranked = True
+    
+    def to_sections(self):
+        """Flatten the trie (pre-order) into arrays for a snapshot file."""
+        if not self.ranked:
+            self._rank()
+        labels = []
+        child_counts, entries = array('i'), array('i')
+        top, top_offsets = array('i'), array('q', [0])
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            labels.append(node.label)
+            child_counts.append(len(node.children))
+            entries.append(node.entry)
+            top.extend(node.top)
+            top_offsets.append(len(top))
+            stack.extend(reversed(node.children))
+        label_blob, label_offsets = pack_strings(labels)
+        return {
+            'trie_labels': label_blob, 'trie_lbl_offsets': label_offsets,
+            'trie_children': child_counts, 'trie_entries': entries,
+            'trie_top': top, 'trie_top_offsets': top_offsets,
+        }
+    
+    @classmethod
+    def from_sections(cls, sections, all_words, top_k=10):
+        """
+        Rebuild a trie written by to_sections (with the default ranking) over the
+        same all_words entries ({'word', 'data'} dicts in insertion order).
+        """
+        trie = cls(top_k)
+        trie.all_words.extend(all_words)
+        labels = unpack_strings(sections['trie_labels'], sections['trie_lbl_offsets'])
+        child_counts, entries = sections['trie_children'], sections['trie_entries']
+        top, top_offsets = sections['trie_top'], sections['trie_top_offsets']
+        
+        pending = []   # [node, children still to attach], innermost last
+        for k, label in enumerate(labels):
+            node = trie.root if k == 0 else TrieNode(label)
+            node.entry = entries[k]
+            node.top = tuple(top[top_offsets[k]:top_offsets[k + 1]])
+            if pending:
+                parent = pending[-1]
+                parent[0].keys += label[0]
+                parent[0].children.append(node)
+                parent[1] -= 1
+                if parent[1] == 0:
+                    pending.pop()
+            if child_counts[k]:
+                pending.append([node, child_counts[k]])
+        return trie
     
     def _fuzzy_search(self, query, max_distance=2):
         """
         Fuzzy search using Levenshtein distance for typo tolerance.
-        Returns words within edit distance of query.
+        Returns words within edit distance of query: score 0 if query is a substring,
+        else the distance to the word's first len(query)+1 characters, else the
+        distance to the first matching sub-word. Only words the fuzzy index reports
+        as possible matches get a (banded) Levenshtein check.
         """
         query = query.lower()
-        results = []
+        words = self.all_words
+        scores = {i: 0 for i, item in enumerate(words) if query in item['word']}
         
-        for item in self.all_words:
-            word = item['word']
-            # Check if query is substring
-            if query in word:
-                results.append({'name': word, 'data': item['data'], 'score': 0})
-                continue
-            
-            # Check edit distance on the beginning of the word
-            if len(query) >= 2:
-                # Compare query against first N characters of word
-                compare_len = min(len(query) + 1, len(word))
-                word_prefix = word[:compare_len]
-                dist = self._levenshtein(query, word_prefix)
-                
-                if dist <= max_distance:
-                    results.append({'name': word, 'data': item['data'], 'score': dist})
+        # Check edit distance on the beginning of the word, then on each sub-word
+        if len(query) >= 2:
+            cut = len(query) + 1
+            distances = {}   # Compared text -> distance, each computed once per query
+            for i in sorted(self.fuzzy_index.lookup(query, max_distance)):
+                if i in scores:
                     continue
-                
-                # Also check if any word in multi-word names matches
-                for sub_word in word.split():
-                    if len(sub_word) >= 2:
-                        dist = self._levenshtein(query, sub_word[:len(query)+1])
-                        if dist <= max_distance:
-                            results.append({'name': word, 'data': item['data'], 'score': dist})
-                            break
+                word = words[i]['word']
+                for key in [word[:cut]] + [sub_word[:cut] for sub_word in word.split() if len(sub_word) >= 2]:
+                    dist = distances.get(key)
+                    if dist is None:
+                        dist = distances[key] = self._bounded_levenshtein(query, key, max_distance)
+                    if dist <= max_distance:
+                        scores[i] = dist
+                        break
         
-        # Sort by score (lower is better match)
-        results.sort(key=lambda x: x['score'])
-        return results[:10]
+        # Sort by score (lower is better match), ties in insertion order
+        ranked = sorted(scores, key=lambda i: (scores[i], i))
+        return [{'name': words[i]['word'], 'data': words[i]['data'], 'score': scores[i]} for i in ranked[:10]]
     
     def _levenshtein(self, s1, s2):
         """Calculate Levenshtein edit distance between two strings."""
@@ -102,17 +253,96 @@ class Trie:
             prev_row = curr_row
         
         return prev_row[-1]
+
+    @staticmethod
+    def _bounded_levenshtein(s1, s2, max_distance):
+        """
+        Levenshtein distance of s1 and s2 when it is at most max_distance, else
+        max_distance + 1. Only the diagonal band |i - j| <= max_distance of the
+        table is filled, and the scan stops once every cell in a row is over.
+        """
+        over = max_distance + 1
+        if abs(len(s1) - len(s2)) > max_distance:
+            return over
+        prev_row = [min(j, over) for j in range(len(s2) + 1)]
+        for i, c1 in enumerate(s1, 1):
+            curr_row = [over] * (len(s2) + 1)
+            curr_row[0] = min(i, over)
+            low, high = max(1, i - max_distance), min(len(s2), i + max_distance)
+            for j in range(low, high + 1):
+                curr_row[j] = min(prev_row[j] + 1, curr_row[j - 1] + 1,
+                                  prev_row[j - 1] + (c1 != s2[j - 1]), over)
+            if min(curr_row[low - 1:high + 1]) == over:
+                return over
+            prev_row = curr_row
+        return prev_row[-1]
+
+class FuzzyIndex:
+    """
+    Symmetric-deletion (SymSpell) index for Trie._fuzzy_search.
+    A query of length L is compared with the first L + 1 characters of every word
+    and sub-word. The index only looks at the first n = min(L + 1, KEY_LENGTH)
+    characters of both. Two strings within edit distance k always share a string
+    reachable from both by at most k deletions, and cutting those to n - k
+    characters keeps that true when only the first KEY_LENGTH characters of each
+    are kept. So a table per (n, k) from deletions to word positions finds every
+    word that can match, whatever the query length; the caller confirms each
+    with a real Levenshtein distance. Tables below KEY_LENGTH hold whole keys and
+    need no cut. At most KEY_LENGTH - 2 tables per k ever exist, built on first use.
+    """
+    KEY_LENGTH = 8
     
-    def _collect_words(self, node, current_word, suggestions):
-        """Recursively collect all complete words from current node."""
-        if node.is_end_of_word:
-            suggestions.append({
-                'name': current_word,
-                'data': node.poi_data
-            })
-        
-        for char, child_node in node.children.items():
-            self._collect_words(child_node, current_word + char, suggestions)
+    def __init__(self, entries):
+        self.entries = entries   # Trie.all_words, shared
+        self.tables = {}
+    
+    def clear(self):
+        """Drop the tables after the word list changed."""
+        self.tables = {}
+    
+    @staticmethod
+    def _deletions(text, max_distance):
+        """Every string obtained from text by deleting at most max_distance characters."""
+        result = {text}
+        frontier = {text}
+        for _ in range(max_distance):
+            frontier = {item[:i] + item[i + 1:] for item in frontier for i in range(len(item))}
+            result |= frontier
+        return result
+    
+    def _variants(self, text, length, max_distance):
+        """The deletions of text[:length] the table for length is keyed on."""
+        deletions = self._deletions(text[:length], max_distance)
+        if length < self.KEY_LENGTH:
+            return deletions
+        return {item[:length - max_distance] for item in deletions}
+    
+    def _table(self, length, max_distance):
+        """Deletion -> word positions for keys cut to length characters."""
+        table = self.tables.get((length, max_distance))
+        if table is None:
+            keys = {}
+            for i, item in enumerate(self.entries):
+                word = item['word']
+                keys.setdefault(word[:length], []).append(i)
+                for sub_word in word.split():
+                    if len(sub_word) >= 2:
+                        keys.setdefault(sub_word[:length], []).append(i)
+            table = {}
+            for key, positions in keys.items():
+                for variant in self._variants(key, length, max_distance):
+                    table.setdefault(variant, []).extend(positions)
+            self.tables[(length, max_distance)] = table
+        return table
+    
+    def lookup(self, query, max_distance=2):
+        """Positions of the words that may be within max_distance of query (a superset)."""
+        length = min(len(query) + 1, self.KEY_LENGTH)
+        table = self._table(length, max_distance)
+        candidates = set()
+        for variant in self._variants(query, length, max_distance):
+            candidates.update(table.get(variant, ()))
+        return candidates
 
 #  MERGE SORT (Usman) 
 def merge_sort(data_list, key):
@@ -176,23 +406,183 @@ class MinHeap:
     def is_empty(self):
         return len(self.heap) == 0
     
+    def peek(self):
+        """Smallest item without removing it (None if empty)."""
+        return self.heap[0] if self.heap else None
+    
     def _sift_up(self, index):
-        parent_idx = (index - 1) // 2
-        if index > 0 and self.heap[index][0] < self.heap[parent_idx][0]:
-            self.heap[index], self.heap[parent_idx] = self.heap[parent_idx], self.heap[index]
-            self._sift_up(parent_idx)
+        # Move the hole up instead of swapping at every level
+        heap = self.heap
+        item = heap[index]
+        key = item[0]
+        while index > 0:
+            parent_idx = (index - 1) // 2
+            parent = heap[parent_idx]
+            if not key < parent[0]:
+                break
+            heap[index] = parent
+            index = parent_idx
+        heap[index] = item
     
     def _sift_down(self, index):
-        smallest = index
-        left = 2 * index + 1
-        right = 2 * index + 2
-        if left < len(self.heap) and self.heap[left][0] < self.heap[smallest][0]:
-            smallest = left
-        if right < len(self.heap) and self.heap[right][0] < self.heap[smallest][0]:
-            smallest = right
-        if smallest != index:
-            self.heap[index], self.heap[smallest] = self.heap[smallest], self.heap[index]
-            self._sift_down(smallest)
+        heap = self.heap
+        size = len(heap)
+        item = heap[index]
+        key = item[0]
+        while True:
+            smallest, smallest_key = index, key
+            left = 2 * index + 1
+            right = left + 1
+            if left < size and heap[left][0] < smallest_key:
+                smallest, smallest_key = left, heap[left][0]
+            if right < size and heap[right][0] < smallest_key:
+                smallest = right
+            if smallest == index:
+                break
+            heap[index] = heap[smallest]
+            index = smallest
+        heap[index] = item
+
+class IndexedMinHeap:
+    """
+    Addressable Min Heap: items are tuples (priority, ..., key) and every key is
+    queued at most once. Positions are tracked per key, so a better priority for
+    a queued key moves its entry up in place (decrease-key) instead of pushing a
+    duplicate. Same push/pop/is_empty/peek API as MinHeap.
+    """
+    def __init__(self):
+        self.heap = []
+        self.position = {}
+    
+    def push(self, item):
+        """Insert item, or lower the priority of its key if that key is already queued."""
+        key = item[-1]
+        index = self.position.get(key)
+        if index is None:
+            self.heap.append(item)
+            self._sift_up(len(self.heap) - 1)
+        elif item[0] < self.heap[index][0]:
+            self.heap[index] = item
+            self._sift_up(index)
+    
+    def decrease_key(self, key, priority):
+        """Lower the priority of a queued key (KeyError if it is not queued)."""
+        index = self.position[key]
+        item = self.heap[index]
+        if priority < item[0]:
+            self.heap[index] = (priority,) + tuple(item[1:])
+            self._sift_up(index)
+    
+    def pop(self):
+        if not self.heap:
+            return None
+        root = self.heap[0]
+        del self.position[root[-1]]
+        last = self.heap.pop()
+        if self.heap:
+            self.heap[0] = last
+            self._sift_down(0)
+        return root
+    
+    def is_empty(self):
+        return len(self.heap) == 0
+    
+    def peek(self):
+        """Smallest item without removing it (None if empty)."""
+        return self.heap[0] if self.heap else None
+    
+    def __contains__(self, key):
+        return key in self.position
+    
+    def _sift_up(self, index):
+        heap, position = self.heap, self.position
+        item = heap[index]
+        priority = item[0]
+        while index > 0:
+            parent_idx = (index - 1) // 2
+            parent = heap[parent_idx]
+            if not priority < parent[0]:
+                break
+            heap[index] = parent
+            position[parent[-1]] = index
+            index = parent_idx
+        heap[index] = item
+        position[item[-1]] = index
+    
+    def _sift_down(self, index):
+        heap, position = self.heap, self.position
+        size = len(heap)
+        item = heap[index]
+        priority = item[0]
+        while True:
+            smallest, smallest_priority = index, priority
+            left = 2 * index + 1
+            right = left + 1
+            if left < size and heap[left][0] < smallest_priority:
+                smallest, smallest_priority = left, heap[left][0]
+            if right < size and heap[right][0] < smallest_priority:
+                smallest = right
+            if smallest == index:
+                break
+            heap[index] = heap[smallest]
+            position[heap[index][-1]] = index
+            index = smallest
+        heap[index] = item
+        position[item[-1]] = index
+
+class RadixHeap:
+    """
+    Monotone priority queue for non-negative costs (radix heap).
+    Priorities (item[0], seconds) are scaled to integer milliseconds. Bucket i holds
+    keys whose highest bit differing from the last popped key is bit i - 1, so a
+    push is O(1) and each item is redistributed at most once per bit.
+    Keys must never go below the last popped key; a smaller one (only possible
+    with a slightly inconsistent heuristic) is clamped up to it.
+    Same push/pop/is_empty/peek API as MinHeap.
+    """
+    def __init__(self, scale=1000):
+        self.scale = scale
+        self.buckets = [[] for _ in range(65)]
+        self.last = 0
+        self.size = 0
+    
+    def push(self, item):
+        key = int(item[0] * self.scale)
+        if key < self.last:
+            key = self.last
+        self.buckets[(key ^ self.last).bit_length()].append((key, item))
+        self.size += 1
+    
+    def pop(self):
+        if not self.size:
+            return None
+        self._refill()
+        self.size -= 1
+        return self.buckets[0].pop()[1]
+    
+    def is_empty(self):
+        return self.size == 0
+    
+    def peek(self):
+        """Smallest item without removing it (None if empty)."""
+        if not self.size:
+            return None
+        self._refill()
+        return self.buckets[0][-1][1]
+    
+    def _refill(self):
+        """Make bucket 0 (keys equal to last) non-empty by splitting the first non-empty bucket."""
+        buckets = self.buckets
+        if buckets[0]:
+            return
+        i = 1
+        while not buckets[i]:
+            i += 1
+        entries = buckets[i]
+        buckets[i] = []
+        last = self.last = min(entry[0] for entry in entries)
+        for entry in entries:
+            buckets[(entry[0] ^ last).bit_length()].append(entry)
 
 #  SPATIAL GRID 
 class SpatialGrid:
@@ -217,10 +607,292 @@ class SpatialGrid:
                     nearby.extend(self.grid[k])
         return nearby
 
+#  KD TREE 
+class KDTree:
+    """
+    Static 2-d tree over (lat, lon) points for k-nearest queries.
+    Stored implicitly: the point of subtree [lo, hi) sits at its middle slot
+    (lo + hi) // 2 of order[], splitting on axis[middle]; the left half holds
+    the points at or below it on that axis and the right half those at or above.
+    """
+    def __init__(self, lat, lon, indices):
+        self.lat = lat
+        self.lon = lon
+        self.order = array('i', indices)
+        self.axis = array('B', [0]) * len(indices)
+        self._build()
+    
+    def _build(self, small=64):
+        """
+        Median split per subrange with np.argpartition (linear, no sorting) down to
+        `small` points; below that NumPy call overhead dominates and the few
+        remaining levels are finished with a plain sort.
+        """
+        lat, lon = self.lat, self.lon
+        coords = (np.asarray(lat), np.asarray(lon))
+        order = np.asarray(self.order, dtype=np.int64)
+        stack = [(0, len(order))]
+        finish = []
+        while stack:
+            lo, hi = stack.pop()
+            if hi - lo <= small:
+                finish.append((lo, hi))
+                continue
+            points = order[lo:hi]
+            lats, lons = coords[0][points], coords[1][points]
+            # Split on the wider side so cells stay roughly square
+            axis = 0 if lats.max() - lats.min() >= lons.max() - lons.min() else 1
+            middle = (lo + hi) // 2
+            order[lo:hi] = points[np.argpartition(lats if axis == 0 else lons, middle - lo)]
+            self.axis[middle] = axis
+            stack.append((lo, middle))
+            stack.append((middle + 1, hi))
+        
+        self.order = order = array('i', order.tolist())
+        stack = finish
+        while stack:
+            lo, hi = stack.pop()
+            if hi - lo <= 1:
+                continue
+            points = order[lo:hi]
+            lats = list(map(lat.__getitem__, points))
+            lons = list(map(lon.__getitem__, points))
+            axis = 0 if max(lats) - min(lats) >= max(lons) - min(lons) else 1
+            coord = lats if axis == 0 else lons
+            order[lo:hi] = array('i', [points[k] for k in sorted(range(len(points)), key=coord.__getitem__)])
+            middle = (lo + hi) // 2
+            self.axis[middle] = axis
+            stack.append((lo, middle))
+            stack.append((middle + 1, hi))
+    
+    def nearest(self, target_lat, target_lon, k=1):
+        """
+        Up to k (squared degree distance, index) pairs closest to the target, nearest
+        first. Ties go to the lower index, whatever the tree layout.
+        """
+        lat, lon, order, axes = self.lat, self.lon, self.order, self.axis
+        best = []           # Sorted (dist_sq, index), at most k long
+        worst = float('inf')
+        stack = [(0, len(order), 0.0)]
+        while stack:
+            lo, hi, gap = stack.pop()
+            if gap > worst or lo >= hi:
+                continue  # Whole subtree is farther than the current k-th best
+            middle = (lo + hi) // 2
+            i = order[middle]
+            d_lat = lat[i] - target_lat
+            d_lon = lon[i] - target_lon
+            dist_sq = d_lat * d_lat + d_lon * d_lon
+            candidate = (dist_sq, i)
+            if len(best) < k or candidate < best[-1]:
+                slot = len(best)
+                while slot and best[slot - 1] > candidate:
+                    slot -= 1
+                best.insert(slot, candidate)
+                if len(best) > k:
+                    best.pop()
+                if len(best) == k:
+                    worst = best[-1][0]
+            
+            diff = d_lat if axes[middle] == 0 else d_lon
+            # Near side last so it is searched first; the far side only if the split plane is close enough
+            if diff > 0:
+                stack.append((middle + 1, hi, diff * diff))
+                stack.append((lo, middle, 0.0))
+            else:
+                stack.append((lo, middle, diff * diff))
+                stack.append((middle + 1, hi, 0.0))
+        return best
+
+#  EDGE SNAPPING 
+def parse_linestring(text):
+    """'LINESTRING (lon lat, lon lat, ...)' -> [(lat, lon), ...], [] if there is no geometry."""
+    start, end = text.find('('), text.rfind(')')
+    if start == -1 or end <= start:
+        return []
+    points = []
+    for pair in text[start + 1:end].split(','):
+        parts = pair.split()
+        if len(parts) >= 2:
+            points.append((float(parts[1]), float(parts[0])))
+    return points
+
+class SnapPoint:
+    """
+    A location projected onto the road network, usable as a virtual start or end
+    point by a_star_search. It lies fraction (0..1, by length) of the way along
+    CSR edge `edge` from dense node source to dense node target; twin is the edge
+    target -> source over the same road (-1 if the road is one-way). dist_sq is
+    the squared distance (m^2) from (lat, lon) to the road.
+    """
+    def __init__(self, lat, lon, edge, twin, source, target, fraction, dist_sq):
+        self.lat = lat
+        self.lon = lon
+        self.edge = edge
+        self.twin = twin
+        self.source = source
+        self.target = target
+        self.fraction = fraction
+        self.dist_sq = dist_sq
+    
+    def __repr__(self):
+        return f"SnapPoint(edge={self.edge}, fraction={self.fraction:.3f})"
+
+class SegmentIndex:
+    """
+    Grid bucket index over the straight segments of the edge geometries usable by
+    one mode. A two-way road is indexed once (through one of its two CSR edges).
+    Each segment is filed under every cell its bounding box touches. Cells are in
+    degrees; projections, lengths and distances are in metres, since a degree of
+    longitude is ~16% shorter than a degree of latitude here.
+    """
+    def __init__(self, graph, mode_flag, cell_size=0.001):
+        from algorithms import METERS_PER_DEG_LAT, METERS_PER_DEG_LON
+        self.m_lat, self.m_lon = METERS_PER_DEG_LAT, METERS_PER_DEG_LON
+        self.cell_size = cell_size
+        self.grid = {}
+        self.edge = array('i')                      # CSR edge of each segment
+        self.coords = array('d')                    # lat1, lon1, lat2, lon2 per segment
+        self.before = array('d')                    # Edge length (m) before the segment starts
+        self.length = {}                            # CSR edge -> total geometry length (m)
+        
+        offsets, targets, flags = graph.csr_offsets, graph.csr_targets, graph.csr_flags
+        lat, lon = graph.lat, graph.lon
+        seen = set()
+        for u in range(len(graph.node_ids)):
+            for e in range(offsets[u], offsets[u + 1]):
+                if not flags[e] & mode_flag:
+                    continue
+                v = targets[e]
+                road = (min(u, v), max(u, v), graph.csr_weights[e])
+                if road in seen:
+                    continue
+                seen.add(road)
+                points = parse_linestring(graph.edge_geometry(e)) or [(lat[u], lon[u]), (lat[v], lon[v])]
+                if len(points) == 1:
+                    points.append(points[0])
+                # Both directions of a road share one geometry: make it run from u
+                first, last = points[0], points[-1]
+                if (first[0] - lat[u]) ** 2 + (first[1] - lon[u]) ** 2 > (last[0] - lat[u]) ** 2 + (last[1] - lon[u]) ** 2:
+                    points.reverse()
+                total = 0.0
+                for (lat1, lon1), (lat2, lon2) in zip(points, points[1:]):
+                    self._add(e, lat1, lon1, lat2, lon2, total)
+                    total += math.hypot((lat2 - lat1) * self.m_lat, (lon2 - lon1) * self.m_lon)
+                self.length[e] = total
+    
+    def _add(self, e, lat1, lon1, lat2, lon2, before):
+        segment = len(self.edge)
+        self.edge.append(e)
+        self.coords.extend((lat1, lon1, lat2, lon2))
+        self.before.append(before)
+        size = self.cell_size
+        for i in range(int(math.floor(min(lat1, lat2) / size)), int(math.floor(max(lat1, lat2) / size)) + 1):
+            for j in range(int(math.floor(min(lon1, lon2) / size)), int(math.floor(max(lon1, lon2) / size)) + 1):
+                self.grid.setdefault((i, j), []).append(segment)
+    
+    def _project(self, segment, lat, lon):
+        """(squared distance in m^2, position 0..1 along segment) of the closest point to (lat, lon)."""
+        k = 4 * segment
+        lat1, lon1 = self.coords[k], self.coords[k + 1]
+        d_y, d_x = (self.coords[k + 2] - lat1) * self.m_lat, (self.coords[k + 3] - lon1) * self.m_lon
+        p_y, p_x = (lat - lat1) * self.m_lat, (lon - lon1) * self.m_lon
+        length_sq = d_y * d_y + d_x * d_x
+        t = 0.0
+        if length_sq > 0:
+            t = (p_y * d_y + p_x * d_x) / length_sq
+            t = 0.0 if t < 0 else 1.0 if t > 1 else t
+        off_y, off_x = t * d_y - p_y, t * d_x - p_x
+        return off_y * off_y + off_x * off_x, t
+    
+    def nearest(self, lat, lon, max_distance=0.01):
+        """
+        Closest segment within max_distance degrees of latitude: (CSR edge, fraction
+        along the edge, squared distance in m^2), or None. Rings of cells are
+        searched outwards until no unvisited cell can hold anything closer.
+        """
+        size = self.cell_size
+        ci, cj = int(math.floor(lat / size)), int(math.floor(lon / size))
+        best, best_segment, best_t = (max_distance * self.m_lat) ** 2, -1, 0.0
+        # Cells are narrower across longitude, so a ring's lower bound uses that side
+        cell_metres = size * min(self.m_lat, self.m_lon)
+        checked = set()
+        for ring in range(int(max_distance * self.m_lat / cell_metres) + 2):
+            if best_segment != -1 and best <= ((ring - 1) * cell_metres) ** 2:
+                break  # Cells from this ring on are at least (ring - 1) cells away
+            for i in range(ci - ring, ci + ring + 1):
+                for j in range(cj - ring, cj + ring + 1):
+                    if max(abs(i - ci), abs(j - cj)) != ring:
+                        continue
+                    for segment in self.grid.get((i, j), ()):
+                        if segment in checked:
+                            continue
+                        checked.add(segment)
+                        dist_sq, t = self._project(segment, lat, lon)
+                        if dist_sq < best:
+                            best, best_segment, best_t = dist_sq, segment, t
+        if best_segment == -1:
+            return None
+        e = self.edge[best_segment]
+        k = 4 * best_segment
+        segment_length = math.hypot((self.coords[k + 2] - self.coords[k]) * self.m_lat,
+                                    (self.coords[k + 3] - self.coords[k + 1]) * self.m_lon)
+        total = self.length[e]
+        fraction = (self.before[best_segment] + best_t * segment_length) / total if total > 0 else 0.0
+        return e, fraction, best
+
+#  CSR VIEWS (mmap backend) 
+class NodeView(Mapping):
+    """Read-only {node_id: {'lat', 'lon', 'ele'}} view over the node arrays."""
+    def __init__(self, graph):
+        self._graph = graph
+    
+    def __getitem__(self, node_id):
+        i = self._graph.node_index[node_id]
+        return {'lat': self._graph.lat[i], 'lon': self._graph.lon[i], 'ele': self._graph.ele[i]}
+    
+    def __contains__(self, node_id):
+        return node_id in self._graph.node_index
+    
+    def __iter__(self):
+        return iter(self._graph.node_ids)
+    
+    def __len__(self):
+        return len(self._graph.node_ids)
+
+class AdjacencyView(Mapping):
+    """Read-only {node_id: [edge tuples]} view, tuples are built on access."""
+    def __init__(self, graph):
+        self._graph = graph
+    
+    def __getitem__(self, node_id):
+        return self._graph.edge_tuples(self._graph.node_index[node_id])
+    
+    def __contains__(self, node_id):
+        return node_id in self._graph.node_index
+    
+    def __iter__(self):
+        return iter(self._graph.node_ids)
+    
+    def __len__(self):
+        return len(self._graph.node_ids)
+
 #  CITY GRAPH 
 class CityGraph:
-    """Main graph data structure for the navigation system."""
-    def __init__(self):
+    """
+    Main graph data structure for the navigation system.
+    
+    The road network is always held as CSR arrays (edges of dense node index i are
+    csr_offsets[i]..csr_offsets[i+1]), which is what the search algorithms iterate.
+    nodes/adj_list are read-only views that build the node dicts and adjacency
+    tuples on access. backend='dict' reads the arrays into memory; backend='mmap'
+    maps them straight from the graph snapshot, so a pool of worker processes
+    shares one physical copy.
+    """
+    def __init__(self, backend='dict'):
+        if backend not in ('dict', 'mmap'):
+            raise ValueError(f"Unknown graph backend: {backend}")
+        self.backend = backend
         self.nodes = {}
         self.adj_list = {}
         self.spatial = SpatialGrid()
@@ -228,44 +900,70 @@ class CityGraph:
         self.walk_nodes = set()
         self.pois = []
         self.poi_trie = Trie()
+        self.rush_hour_active = False
+        # Per-edge travel times keyed by (mode, traffic profile), see algorithms.get_edge_costs
+        self.cost_tables = {}
+        # Optional ALT landmark tables used as the A* heuristic, see landmarks.py
+        self.landmarks = None
+        # Contraction hierarchies keyed by (mode, traffic profile), see contraction.py
+        self.hierarchies = {}
+        # Partition overlay with per-profile customizations, see overlay.py
+        self.overlay = None
+        # Per-mode KD-trees for find_nearest_node, see nearest_index
+        self.node_trees = {}
+        # Per-mode segment indexes for snap_to_edge, built on first use
+        self.segment_indexes = {}
+        # Per-mode NumPy coordinate arrays for snap_many, built on first use
+        self.snap_pools = {}
+        # (lat, lon) of every POI -> (drive node, walk node), see _build_poi_index
+        self.poi_nodes = {}
 
-    def load_data(self, nodes_file, edges_file, pois_file="pois.json"):
+    def load_data(self, nodes_file, edges_file, pois_file="pois.json", snapshot_file=None):
+        """
+        Load the road network and POIs.
+        The network is read from a compiled binary snapshot when one exists for the
+        current nodes/edges files, otherwise it is parsed from JSON and the snapshot
+        is written for next time. Pass snapshot_file=False to always use JSON
+        (not available with the mmap backend).
+        """
         print("Loading graph data...")
         
-        # Load nodes
-        with open(nodes_file, 'r') as f:
-            nodes_data = json.load(f)
-        for n_id, data in nodes_data.items():
-            node_id = int(n_id)
-            self.nodes[node_id] = {
-                'lat': data['lat'],
-                'lon': data['lon'],
-                'ele': data.get('elevation', 0)
-            }
-            self.adj_list[node_id] = []
-
-        # Load edges
-        with open(edges_file, 'r') as f:
-            edges_data = json.load(f)
-        for edge in edges_data:
-            u, v = int(edge['u']), int(edge['v'])
-            if u in self.nodes and v in self.nodes:
-                # (v, weight, is_walk, is_drive, geometry, highway_type)
-                self.adj_list[u].append((
-                    v,
-                    edge['weight'],
-                    edge['is_walkable'],
-                    edge['is_drivable'],
-                    edge.get('geometry', ''),
-                    edge.get('highway', '')
-                ))
-                
-                if edge['is_drivable']:
-                    self.drive_nodes.add(u)
-                    self.drive_nodes.add(v)
-                if edge['is_walkable']:
-                    self.walk_nodes.add(u)
-                    self.walk_nodes.add(v)
+        if snapshot_file is None:
+            snapshot_file = os.path.join(os.path.dirname(nodes_file), SNAPSHOT_FILE)
+        if not snapshot_file and self.backend == 'mmap':
+            raise ValueError("The mmap backend needs a graph snapshot file")
+        
+        read = map_snapshot if self.backend == 'mmap' else read_snapshot
+        sections = None
+        checksum = None
+        if snapshot_file:
+            checksum = source_checksum([nodes_file, edges_file])
+            try:
+                sections = read(snapshot_file, checksum)
+            except (OSError, ValueError, struct.error) as e:
+                print(f"  Graph snapshot unreadable ({e}), rebuilding from JSON")
+        
+        if sections is not None:
+            print(f" Loaded compiled graph snapshot ({os.path.basename(snapshot_file)})")
+        else:
+            sections = self._compile_json(nodes_file, edges_file)
+            if snapshot_file:
+                try:
+                    write_snapshot(snapshot_file, checksum, sections)
+                    print(f" Wrote graph snapshot ({os.path.basename(snapshot_file)})")
+                    if self.backend == 'mmap':
+                        sections = map_snapshot(snapshot_file, checksum)
+                except OSError as e:
+                    if self.backend == 'mmap':
+                        raise
+                    print(f"  Could not write graph snapshot: {e}")
+        
+        self._attach_csr(sections)
+        self.nodes = NodeView(self)
+        self.adj_list = AdjacencyView(self)
+        self.snapshot_file = snapshot_file or None
+        # Identifies the source data for caches derived from it (landmarks, hierarchies)
+        self.source_checksum = checksum
         
         #  Load POIs from both sources 
         self.pois = []
@@ -300,10 +998,204 @@ class CityGraph:
         print(f"🔍 Building search index for {len(self.pois)} locations...")
         for p in self.pois:
             self.spatial.add_poi(p['name'], p['lat'], p['lon'], p['type'])
-            self.poi_trie.insert(p['name'], p)
+        self._build_poi_index()
         
         print(f" Ready! {len(self.nodes)} nodes, {len(self.pois)} searchable locations")
 
+    def _build_poi_index(self):
+        """
+        Snap every POI to its drive and walk node and build the autocomplete trie,
+        once per POI set. Both are kept in POI_SNAP_FILE next to the graph snapshot,
+        keyed by the graph data and the POI names and coordinates, and rebuilt
+        (snap_many plus trie inserts) when either changes.
+        Each POI dict gets 'drive_node' and 'walk_node'.
+        """
+        coords = array('d')
+        for p in self.pois:
+            coords.extend((p['lat'], p['lon']))
+        digest = hashlib.sha256(self.source_checksum or b'')
+        digest.update(coords.tobytes())
+        digest.update('\0'.join(p['name'] for p in self.pois).encode('utf-8'))
+        digest.update(repr((CAMPUS_ROAD_TYPES, SNAP_RADII, SNAP_CANDIDATES, 'radix-trie')).encode('utf-8'))
+        key = digest.digest()
+        
+        path = os.path.join(os.path.dirname(self.snapshot_file), POI_SNAP_FILE) if self.snapshot_file else None
+        sections = None
+        if path:
+            try:
+                sections = read_snapshot(path, key)
+            except (OSError, ValueError, struct.error):
+                sections = None
+        if sections is not None:
+            all_words = [{'word': p['name'].lower(), 'data': p} for p in self.pois]
+            self.poi_trie = Trie.from_sections(sections, all_words)
+        else:
+            pairs = list(zip(coords[0::2], coords[1::2]))
+            sections = {mode: array('q', [-1 if n is None else n for n in self.snap_many(pairs, mode)[0]])
+                        for mode in ('car', 'walk')}
+            self.poi_trie = Trie()
+            for p in self.pois:
+                self.poi_trie.insert(p['name'], p)
+            sections.update(self.poi_trie.to_sections())
+            if path:
+                try:
+                    write_snapshot(path, key, sections)
+                except OSError as e:
+                    print(f"  Could not write POI index: {e}")
+        
+        self.poi_nodes = {}
+        for p, drive, walk in zip(self.pois, sections['car'], sections['walk']):
+            p['drive_node'] = drive if drive != -1 else None
+            p['walk_node'] = walk if walk != -1 else None
+            self.poi_nodes[(p['lat'], p['lon'])] = (p['drive_node'], p['walk_node'])
+
+    def attach_snapshot(self, snapshot_file, checksum):
+        """
+        Map an existing graph snapshot as this graph's road network (mmap backend,
+        no POIs or search index). Used by worker processes that only run searches.
+        """
+        sections = map_snapshot(snapshot_file, checksum)
+        if sections is None:
+            raise ValueError(f"No usable graph snapshot at {snapshot_file}")
+        self.backend = 'mmap'
+        self._attach_csr(sections)
+        self.nodes = NodeView(self)
+        self.adj_list = AdjacencyView(self)
+        self.snapshot_file = snapshot_file
+        self.source_checksum = checksum
+
+    @staticmethod
+    def _compile_json(nodes_file, edges_file):
+        """Parse nodes/edges JSON into the flat arrays stored in a snapshot."""
+        with open(nodes_file, 'r') as f:
+            nodes_data = json.load(f)
+        
+        node_ids = array('q')
+        lat, lon, ele = array('d'), array('d'), array('d')
+        index = {}
+        for n_id, data in nodes_data.items():
+            index[int(n_id)] = len(node_ids)
+            node_ids.append(int(n_id))
+            lat.append(data['lat'])
+            lon.append(data['lon'])
+            ele.append(data.get('elevation', 0) or 0)
+        
+        with open(edges_file, 'r') as f:
+            edges_data = json.load(f)
+        
+        # Bucket edges by source node, keeping file order within each bucket
+        buckets = [[] for _ in node_ids]
+        for edge in edges_data:
+            u, v = index.get(int(edge['u'])), index.get(int(edge['v']))
+            if u is not None and v is not None:
+                buckets[u].append((v, edge))
+        
+        # CSR adjacency: edges of node i are offsets[i]..offsets[i+1]
+        offsets = array('q', [0])
+        targets, weights = array('i'), array('d')
+        flags, highway = array('B'), array('H')
+        highway_codes = {}
+        geometry = []
+        for bucket in buckets:
+            for v, edge in bucket:
+                hw_type = edge.get('highway', '')
+                if hw_type not in highway_codes:
+                    highway_codes[hw_type] = len(highway_codes)
+                targets.append(v)
+                weights.append(edge['weight'])
+                flags.append((FLAG_WALK if edge['is_walkable'] else 0) |
+                             (FLAG_DRIVE if edge['is_drivable'] else 0))
+                highway.append(highway_codes[hw_type])
+                geometry.append(edge.get('geometry', ''))
+            offsets.append(len(targets))
+        
+        highway_blob, highway_offsets = pack_strings(list(highway_codes))
+        geometry_blob, geometry_offsets = pack_strings(geometry)
+        return {
+            'node_ids': node_ids, 'lat': lat, 'lon': lon, 'ele': ele,
+            'offsets': offsets, 'targets': targets, 'weights': weights,
+            'flags': flags, 'highway': highway,
+            'highway_names': highway_blob, 'highway_offsets': highway_offsets,
+            'geometry': geometry_blob, 'geometry_offsets': geometry_offsets,
+        }
+
+    def _attach_csr(self, sections):
+        """Keep the flat node/edge arrays and derive the per-mode node sets."""
+        self.node_ids = sections['node_ids']
+        self.lat, self.lon, self.ele = sections['lat'], sections['lon'], sections['ele']
+        self.csr_offsets = sections['offsets']
+        self.csr_targets = sections['targets']
+        self.csr_weights = sections['weights']
+        self.csr_flags = sections['flags']
+        self.csr_highway = sections['highway']
+        self.highway_names = unpack_strings(sections['highway_names'], sections['highway_offsets'])
+        self._geometry_blob = sections['geometry']
+        self._geometry_offsets = sections['geometry_offsets']
+        self._reverse_csr = None
+        self.node_trees = {}
+        self.segment_indexes = {}
+        self.snap_pools = {}
+        # OSM id -> dense index (node_ids is the reverse table)
+        self.node_index = dict(zip(self.node_ids, range(len(self.node_ids))))
+        
+        # A node belongs to a mode when any edge of that mode starts or ends at it
+        node_ids = np.asarray(self.node_ids, dtype=np.int64)
+        sources = np.repeat(np.arange(len(node_ids)), np.diff(np.asarray(self.csr_offsets, dtype=np.int64)))
+        targets = np.asarray(self.csr_targets, dtype=np.int64)
+        flags = np.asarray(self.csr_flags)
+        for mode_flag, name in ((FLAG_DRIVE, 'drive_nodes'), (FLAG_WALK, 'walk_nodes')):
+            mask = (flags & mode_flag) != 0
+            members = np.zeros(len(node_ids), dtype=bool)
+            members[sources[mask]] = True
+            members[targets[mask]] = True
+            setattr(self, name, set(node_ids[members].tolist()))
+
+    def edge_tuples(self, u):
+        """Adjacency tuples for dense node index u: (v, weight, is_walk, is_drive, geometry, highway_type)."""
+        node_ids, targets, weights = self.node_ids, self.csr_targets, self.csr_weights
+        flags, highway, names = self.csr_flags, self.csr_highway, self.highway_names
+        return [
+            (node_ids[targets[e]], weights[e], bool(flags[e] & FLAG_WALK), bool(flags[e] & FLAG_DRIVE),
+             self.edge_geometry(e), names[highway[e]])
+            for e in range(self.csr_offsets[u], self.csr_offsets[u + 1])
+        ]
+
+    def edge_geometry(self, e):
+        """Geometry string of CSR edge e."""
+        start, end = self._geometry_offsets[e], self._geometry_offsets[e + 1]
+        return bytes(self._geometry_blob[start:end]).decode('utf-8')
+
+    def reverse_adjacency(self):
+        """
+        Incoming-edge CSR, built once on first use: incoming edges of dense node v
+        are rev_offsets[v]..rev_offsets[v+1], with their source node and forward edge id.
+        Returns (rev_offsets, rev_sources, rev_edges).
+        """
+        if self._reverse_csr is None:
+            n_nodes, offsets, targets = len(self.node_ids), self.csr_offsets, self.csr_targets
+            counts = [0] * (n_nodes + 1)
+            for e in range(len(targets)):
+                counts[targets[e] + 1] += 1
+            rev_offsets = array('q', [0]) * (n_nodes + 1)
+            for v in range(n_nodes):
+                rev_offsets[v + 1] = rev_offsets[v] + counts[v + 1]
+            
+            fill = list(rev_offsets[:-1])
+            rev_sources = array('i', [0]) * len(targets)
+            rev_edges = array('i', [0]) * len(targets)
+            for u in range(n_nodes):
+                for e in range(offsets[u], offsets[u + 1]):
+                    slot = fill[targets[e]]
+                    rev_sources[slot] = u
+                    rev_edges[slot] = e
+                    fill[targets[e]] = slot + 1
+            self._reverse_csr = (rev_offsets, rev_sources, rev_edges)
+        return self._reverse_csr
+
+    def to_index(self, node_id):
+        """OSM node id -> dense index (0..N-1), or None if unknown."""
+        return self.node_index.get(node_id)
+
     def get_neighbors(self, node_id):
         return self.adj_list.get(node_id, [])
     
@@ -314,53 +1206,161 @@ class CityGraph:
         """Get autocomplete suggestions for POI search."""
         return self.poi_trie.search_prefix(prefix)
 
-    def find_nearest_node(self, target_lat, target_lon, mode='car'):
-        """Smart snapping algorithm - prefers campus roads over highways."""
-        candidates = []
-        
+    def _mode_indices(self, mode):
+        """Sorted dense indices of the nodes usable by mode (all nodes if there are none)."""
         pool = self.drive_nodes if mode == 'car' else self.walk_nodes
         if not pool:
-            pool = self.nodes.keys()
+            return np.arange(len(self.node_ids), dtype=np.int64)
+        return np.sort(np.fromiter(map(self.node_index.__getitem__, pool), dtype=np.int64, count=len(pool)))
+
+    def nearest_index(self, mode='car'):
+        """KD-tree over the nodes usable by mode, built on first use (most lookups hit pois.snap)."""
+        mode = 'car' if mode == 'car' else 'walk'
+        if mode not in self.node_trees:
+            self.node_trees[mode] = KDTree(self.lat, self.lon, self._mode_indices(mode).tolist())
+        return self.node_trees[mode]
 
-        # Start with tight radius, expand if needed
-        # 0.00001 ~= 1m, 0.0001 ~= 10m, 0.001 ~= 100m, 0.01 ~= 1km, 0.1 ~= 10km
-        search_radii = [0.00001, 0.0001, 0.001, 0.01, 0.1]
+    def find_nearest_node(self, target_lat, target_lon, mode='car'):
+        """Smart snapping algorithm - prefers campus roads over highways."""
+        # POI locations were snapped once at load time
+        snapped = self.poi_nodes.get((target_lat, target_lon))
+        if snapped is not None:
+            return snapped[0 if mode == 'car' else 1]
         
-        for radius in search_radii:
-            candidates = []
-            for node_id in pool:
-                if node_id not in self.nodes:
-                    continue
-                data = self.nodes[node_id]
-                d_lat = data['lat'] - target_lat
-                d_lon = data['lon'] - target_lon
-                dist_sq = d_lat**2 + d_lon**2
+        # The search radius is the tightest tier that has any node inside it
+        candidates = self.nearest_index(mode).nearest(target_lat, target_lon, k=SNAP_CANDIDATES)
+        if not candidates:
+            return None
+        radius = next((r for r in SNAP_RADII if candidates[0][0] < r), None)
+        if radius is None:
+            return None
+        top_candidates = [(dist, i) for dist, i in candidates if dist < radius]
+        
+        best_node = self.node_ids[top_candidates[0][1]]
+        
+        offsets, highway, names = self.csr_offsets, self.csr_highway, self.highway_names
+        for dist, i in top_candidates:
+            for e in range(offsets[i], offsets[i + 1]):
+                if names[highway[e]] in CAMPUS_ROAD_TYPES:
+                    return self.node_ids[i]
                 
-                if dist_sq < radius:
-                    candidates.append((dist_sq, node_id))
+        return best_node
+
+    def snap_to_edge(self, target_lat, target_lon, mode='car', max_distance=0.01):
+        """
+        Project a coordinate onto the nearest road segment usable by mode (within
+        max_distance degrees, ~1 km). Returns a SnapPoint, or None when no road is
+        close enough (fall back to find_nearest_node then).
+        """
+        mode = 'car' if mode == 'car' else 'walk'
+        if mode not in self.segment_indexes:
+            print(f" Indexing {mode} road segments for edge snapping (one time per session)...")
+            self.segment_indexes[mode] = SegmentIndex(self, FLAG_DRIVE if mode == 'car' else FLAG_WALK)
+        hit = self.segment_indexes[mode].nearest(target_lat, target_lon, max_distance)
+        if hit is None:
+            return None
+        e, fraction, dist_sq = hit
+        source = bisect.bisect_right(self.csr_offsets, e) - 1
+        target = self.csr_targets[e]
+        twin = -1
+        for r in range(self.csr_offsets[target], self.csr_offsets[target + 1]):
+            if self.csr_targets[r] == source and self.csr_weights[r] == self.csr_weights[e]:
+                twin = r
+                break
+        return SnapPoint(target_lat, target_lon, e, twin, source, target, fraction, dist_sq)
+
+    def _snap_pool(self, mode, cell_size):
+        """
+        NumPy arrays for the nodes usable by mode: (dense indices, lat, lon,
+        on-campus-road flags, pool positions sorted by grid cell, cell -> slice of them).
+        """
+        mode = 'car' if mode == 'car' else 'walk'
+        if (mode, cell_size) not in self.snap_pools:
+            indices = self._mode_indices(mode)
+            lat, lon = np.asarray(self.lat)[indices], np.asarray(self.lon)[indices]
             
-            if candidates:
-                break  # Found candidates at this radius
+            offsets = np.asarray(self.csr_offsets, dtype=np.int64)
+            campus_codes = [code for code, name in enumerate(self.highway_names) if name in CAMPUS_ROAD_TYPES]
+            campus_edges = np.isin(np.asarray(self.csr_highway), campus_codes)
+            owners = np.repeat(np.arange(len(self.node_ids)), np.diff(offsets))
+            on_campus = np.zeros(len(self.node_ids), dtype=bool)
+            on_campus[owners[campus_edges]] = True
+            
+            cells = np.floor(np.stack((lat, lon), axis=1) / cell_size).astype(np.int64)
+            by_cell = np.lexsort((cells[:, 1], cells[:, 0]))
+            starts = np.flatnonzero(np.any(np.diff(cells[by_cell], axis=0) != 0, axis=1)) + 1
+            bounds = np.concatenate(([0], starts, [len(by_cell)]))
+            ranges = {(int(cells[by_cell[lo], 0]), int(cells[by_cell[lo], 1])): (int(lo), int(hi))
+                      for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo}
+            self.snap_pools[(mode, cell_size)] = (indices, lat, lon, on_campus[indices], by_cell, ranges)
+        return self.snap_pools[(mode, cell_size)]
+
+    def snap_many(self, coords, mode='car', cell_size=0.002, chunk_size=64):
+        """
+        find_nearest_node for many (lat, lon) pairs at once, vectorized with NumPy.
+        Points are grouped by grid cell and compared against the nodes of the 3x3
+        surrounding cells only; points whose 5 nearest nodes are not provably in
+        there are compared against every node, chunk_size points at a time.
+        Returns (node ids, snap distances in meters): a list with None where no
+        road is in range, and a float array with inf there.
+        """
+        from algorithms import METERS_PER_DEG_LAT, METERS_PER_DEG_LON
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        indices, lat, lon, on_campus, by_cell, ranges = self._snap_pool(mode, cell_size)
+        node_ids = [None] * len(coords)
+        distances = np.full(len(coords), np.inf)
+        if not len(indices) or not len(coords):
+            return node_ids, distances
+        k = min(SNAP_CANDIDATES, len(indices))
+        top = np.zeros((len(coords), k), dtype=np.int64)     # Pool positions of the k nearest nodes
+        top_dist = np.full((len(coords), k), np.inf)
         
-        candidates.sort(key=lambda x: x[0])
-        top_candidates = candidates[:5]
+        def nearest_k(rows, pool):
+            d_lat = lat[pool][None, :] - coords[rows, 0, None]
+            d_lon = lon[pool][None, :] - coords[rows, 1, None]
+            dist_sq = d_lat * d_lat + d_lon * d_lon
+            part = np.argpartition(dist_sq, k - 1, axis=1)[:, :k]
+            return pool[part], np.take_along_axis(dist_sq, part, axis=1)
         
-        if not top_candidates:
-            return None
+        # Grid pass: nodes outside the 3x3 block are at least cell_size away
+        cells = np.floor(coords / cell_size).astype(np.int64)
+        groups, inverse = np.unique(cells, axis=0, return_inverse=True)
+        order = np.argsort(inverse.ravel(), kind='stable')
+        splits = np.cumsum(np.bincount(inverse.ravel(), minlength=len(groups)))[:-1]
+        leftover = []
+        for (ci, cj), rows in zip(groups, np.split(order, splits)):
+            slices = [ranges[(ci + di, cj + dj)] for di in (-1, 0, 1) for dj in (-1, 0, 1)
+                      if (ci + di, cj + dj) in ranges]
+            pool = np.concatenate([by_cell[lo:hi] for lo, hi in slices]) if slices else by_cell[:0]
+            if len(pool) < k:
+                leftover.extend(rows)
+                continue
+            found, found_dist = nearest_k(rows, pool)
+            exact = found_dist.max(axis=1) < cell_size * cell_size
+            top[rows[exact]], top_dist[rows[exact]] = found[exact], found_dist[exact]
+            leftover.extend(rows[~exact])
         
-        best_node = top_candidates[0][1]
+        everything = np.arange(len(indices))
+        leftover = np.asarray(leftover, dtype=np.int64)
+        for start in range(0, len(leftover), chunk_size):
+            rows = leftover[start:start + chunk_size]
+            top[rows], top_dist[rows] = nearest_k(rows, everything)
         
-        for dist, node_id in top_candidates:
-            neighbors = self.adj_list.get(node_id, [])
-            
-            is_campus_road = False
-            
-            for n in neighbors:
-                hw_type = n[5] if len(n) > 5 else ''
-                if hw_type in ['service', 'residential', 'living_street']:
-                    is_campus_road = True
-            
-            if is_campus_road:
-                return node_id
-                
-        return best_node
\ No newline at end of file
+        # Order candidates by (distance, dense index) like the KD-tree does
+        ranked = np.lexsort((top, top_dist), axis=1)
+        top, top_dist = np.take_along_axis(top, ranked, axis=1), np.take_along_axis(top_dist, ranked, axis=1)
+        
+        # Radius tier of the nearest node, then the first in-tier candidate on a campus road
+        radii = np.asarray(SNAP_RADII)
+        tier = np.searchsorted(radii, top_dist[:, 0], side='right')
+        radius = radii[np.minimum(tier, len(radii) - 1)]
+        preferred = on_campus[top] & (top_dist < radius[:, None])
+        pick = np.where(preferred.any(axis=1), preferred.argmax(axis=1), 0)
+        chosen = indices[top[np.arange(len(coords)), pick]]
+        
+        for r in np.flatnonzero(tier < len(radii)):
+            i = int(chosen[r])
+            node_ids[r] = self.node_ids[i]
+            distances[r] = math.hypot((self.lat[i] - coords[r, 0]) * METERS_PER_DEG_LAT,
+                                      (self.lon[i] - coords[r, 1]) * METERS_PER_DEG_LON)
+        return node_ids, distances
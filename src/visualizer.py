@@ -225,6 +225,10 @@ def build_html(route_coords, elevations, start_name, end_name, start_coord, end_
     
     # Additional TSP stats
     a_star_calls = algorithm_stats.get('a_star_calls', 0)
+    dijkstra_sweeps = algorithm_stats.get('dijkstra_sweeps', 0)
+    improvement_iterations = algorithm_stats.get('improvement_iterations', 0)
+    anneal_acceptances = algorithm_stats.get('anneal_acceptances', 0)
+    improve_ms = algorithm_stats.get('improve_ms', 0)
     permutations_checked = algorithm_stats.get('permutations_checked', 0)
     
     pois_html = ""
@@ -1172,6 +1176,8 @@ def build_html(route_coords, elevations, start_name, end_name, start_coord, end_
                             <div class="algo-stat"><strong>{compute_time:.1f}</strong> ms</div>
                         </div>
                         {f'<div class="algo-stats" style="margin-top:8px;"><div class="algo-stat"><strong>{a_star_calls}</strong> A* calls</div><div class="algo-stat"><strong>{permutations_checked}</strong> perms</div></div>' if a_star_calls > 0 else ''}
+                        {f'<div class="algo-stats" style="margin-top:8px;"><div class="algo-stat"><strong>{dijkstra_sweeps}</strong> sweeps</div><div class="algo-stat"><strong>{permutations_checked}</strong> perms</div></div>' if dijkstra_sweeps > 0 else ''}
+                        {f'<div class="algo-stats" style="margin-top:8px;"><div class="algo-stat"><strong>{improvement_iterations}</strong> local search improvements</div><div class="algo-stat"><strong>{anneal_acceptances}</strong> annealing moves accepted</div><div class="algo-stat"><strong>{improve_ms:.1f}</strong> ms local search</div></div>' if 'improvement_iterations' in algorithm_stats else ''}
                     </div>
                 </div>
             </div>
@@ -0,0 +1,104 @@
+import json
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from structures import CityGraph
+
+# A 6x6 street grid (~110 m blocks) next to the NUST campus so the built-in POIs snap
+GRID = 6
+ORIGIN_LAT, ORIGIN_LON = 33.640, 72.985
+STEP = 0.001
+ISLAND = (2000, 2001)
+POIS = [
+    {"name": "Grid Cafe", "lat": 33.6412, "lon": 72.9861, "type": "restaurant"},
+    {"name": "Grid Fuel", "lat": 33.6435, "lon": 72.9889, "type": "fuel"},
+    {"name": "Grid Park", "lat": 33.6448, "lon": 72.9852, "type": "park"},
+]
+
+
+def node_id(row, col):
+    return 1000 + row * GRID + col
+
+
+def make_network(seed=7):
+    """Nodes and edges in the nodes.json / edges.json export format."""
+    rng = random.Random(seed)
+    nodes = {}
+    for row in range(GRID):
+        for col in range(GRID):
+            nodes[str(node_id(row, col))] = {
+                'lat': ORIGIN_LAT + row * STEP + rng.uniform(-2e-4, 2e-4),
+                'lon': ORIGIN_LON + col * STEP + rng.uniform(-2e-4, 2e-4),
+                'elevation': 540 + rng.uniform(0, 25),
+            }
+
+    edges = []
+
+    def add(u, v, highway, walk=True, drive=True, both_ways=True, stretch=1.0):
+        a, b = nodes[str(u)], nodes[str(v)]
+        length = (((a['lat'] - b['lat']) * 111000) ** 2 + ((a['lon'] - b['lon']) * 92700) ** 2) ** 0.5
+        geometry = f"LINESTRING ({a['lon']} {a['lat']}, {b['lon']} {b['lat']})"
+        for x, y in ((u, v), (v, u)) if both_ways else ((u, v),):
+            edges.append({'u': str(x), 'v': str(y), 'weight': length * stretch,
+                          'is_walkable': walk, 'is_drivable': drive,
+                          'highway': highway, 'geometry': geometry})
+
+    for row in range(GRID):
+        for col in range(GRID):
+            here = node_id(row, col)
+            if col + 1 < GRID:
+                if row == 2:
+                    # One-way arterial, eastbound only (pedestrians may walk it both ways)
+                    add(here, node_id(row, col + 1), 'primary', walk=True, drive=True, both_ways=False)
+                    add(node_id(row, col + 1), here, 'primary', walk=True, drive=False, both_ways=False)
+                else:
+                    add(here, node_id(row, col + 1), rng.choice(('residential', 'service', 'tertiary')))
+            if row + 1 < GRID:
+                if col == 4:
+                    add(here, node_id(row + 1, col), 'footway', drive=False)
+                else:
+                    add(here, node_id(row + 1, col), rng.choice(('residential', 'secondary')))
+    # Parallel roads: a slower service lane beside two existing links
+    add(node_id(0, 0), node_id(0, 1), 'service', stretch=1.4)
+    add(node_id(3, 2), node_id(4, 2), 'service', stretch=1.2)
+    # A diagonal shortcut
+    add(node_id(1, 1), node_id(2, 2), 'residential')
+    # An island road nothing else connects to
+    for n, offset in ((ISLAND[0], 0), (ISLAND[1], STEP)):
+        nodes[str(n)] = {'lat': ORIGIN_LAT - 3 * STEP, 'lon': ORIGIN_LON + offset, 'elevation': 545}
+    add(ISLAND[0], ISLAND[1], 'residential')
+    return nodes, edges
+
+
+def write_network(directory, nodes, edges):
+    paths = [os.path.join(directory, name) for name in ('nodes.json', 'edges.json', 'pois.json')]
+    for path, data in zip(paths, (nodes, edges, POIS)):
+        with open(path, 'w') as f:
+            json.dump(data, f)
+    return paths
+
+
+def load_graph(nodes_file, edges_file, pois_file, **kwargs):
+    backend = kwargs.pop('backend', 'dict')
+    graph = CityGraph(backend=backend)
+    graph.load_data(nodes_file, edges_file, pois_file, **kwargs)
+    return graph
+
+
+@pytest.fixture
+def network_files(tmp_path):
+    """(nodes, edges, pois) JSON paths of the fixture network in a fresh directory."""
+    nodes, edges = make_network()
+    return write_network(str(tmp_path), nodes, edges)
+
+
+@pytest.fixture(scope='module')
+def graph(tmp_path_factory):
+    """The fixture network, loaded once per test module."""
+    nodes, edges = make_network()
+    return load_graph(*write_network(str(tmp_path_factory.mktemp('network')), nodes, edges))
@@ -0,0 +1,64 @@
+import pytest
+
+from algorithms import INF, _search_tree, get_alternative_routes, get_edge_costs
+from conftest import ISLAND, node_id
+from landmarks import dijkstra_all
+from test_search import dijkstra_costs, inconsistent_heuristic, path_cost
+
+PAIRS = [
+    (node_id(0, 0), node_id(5, 5)),
+    (node_id(5, 0), node_id(0, 5)),
+    (node_id(2, 5), node_id(2, 0)),
+    (node_id(1, 4), node_id(4, 1)),
+]
+
+
+@pytest.mark.parametrize('mode', ('car', 'walk'))
+def test_alternatives_are_distinct_and_within_stretch(graph, mode):
+    reference = dijkstra_costs(graph, mode)
+    for s, t in PAIRS:
+        routes, stats = get_alternative_routes(graph, s, t, k=3, mode=mode, max_stretch=0.3, return_stats=True)
+        assert routes
+        assert routes[0][1] == pytest.approx(reference[(s, t)])
+        assert stats['nodes_explored'] == stats['nodes_explored_forward'] + stats['nodes_explored_backward']
+        for path, cost in routes:
+            assert path[0] == s and path[-1] == t
+            assert len(set(path)) == len(path)
+            assert cost <= 1.3 * reference[(s, t)] + 1e-6
+            assert path_cost(graph, path, mode) == pytest.approx(cost)
+        assert len({tuple(path) for path, _ in routes}) == len(routes)
+
+
+def test_alternatives_to_unreachable_goal(graph):
+    assert get_alternative_routes(graph, node_id(0, 0), ISLAND[0]) == []
+    routes, stats = get_alternative_routes(graph, ISLAND[0], node_id(0, 0), return_stats=True)
+    assert routes == [] and stats['nodes_explored_backward'] == 0
+    assert dijkstra_costs(graph, 'car')[(ISLAND[0], node_id(0, 0))] == INF
+
+
+@pytest.mark.parametrize('mode', ('car', 'walk'))
+def test_trees_exact_with_inconsistent_estimate(graph, mode):
+    costs = get_edge_costs(graph, mode)
+    for s, t in PAIRS:
+        source, goal = graph.to_index(s), graph.to_index(t)
+        from_source = dijkstra_all(graph, source, costs)
+        to_goal = dijkstra_all(graph, goal, costs, reverse=True)
+        limit = 1.3 * from_source[goal]
+        dist, _ = _search_tree(graph, source, costs, target=goal, stretch=0.3,
+                               estimate=inconsistent_heuristic(graph, source, goal, mode))
+        for i in range(len(graph.node_ids)):
+            if from_source[i] + to_goal[i] <= limit:
+                assert dist[i] == pytest.approx(from_source[i])
+
+
+def test_alternatives_with_inconsistent_heuristic(graph):
+    reference = dijkstra_costs(graph, 'car')
+    graph.landmarks = inconsistent_heuristic
+    try:
+        for s, t in PAIRS:
+            routes = get_alternative_routes(graph, s, t, k=3, mode='car')
+            assert routes[0][1] == pytest.approx(reference[(s, t)])
+            for path, cost in routes:
+                assert path_cost(graph, path, 'car') == pytest.approx(cost)
+    finally:
+        graph.landmarks = None
@@ -0,0 +1,64 @@
+import random
+
+from structures import IndexedMinHeap, MinHeap, RadixHeap
+
+
+def drain(heap):
+    items = []
+    while not heap.is_empty():
+        top = heap.peek()
+        items.append(heap.pop())
+        assert items[-1] == top
+    assert heap.pop() is None
+    return items
+
+
+def test_min_heap_pops_in_order():
+    rng = random.Random(1)
+    items = [(rng.randint(0, 50), i) for i in range(500)]
+    heap = MinHeap()
+    for item in items:
+        heap.push(item)
+    popped = drain(heap)
+    assert [priority for priority, _ in popped] == sorted(priority for priority, _ in items)
+    assert sorted(popped) == sorted(items)
+
+
+def test_indexed_heap_keeps_best_priority_per_key():
+    rng = random.Random(2)
+    heap, best = IndexedMinHeap(), {}
+    for _ in range(2000):
+        if best and rng.random() < 0.25:
+            priority, key = heap.pop()
+            assert priority == min(best.values())
+            assert best.pop(key) == priority
+            continue
+        key = rng.randrange(100)
+        priority = rng.uniform(0, 100)
+        if key in heap and rng.random() < 0.5:
+            heap.decrease_key(key, priority)
+        else:
+            heap.push((priority, key))
+        best[key] = min(best.get(key, priority), priority)
+        assert len(heap.heap) == len(best)
+    assert [key for _, key in drain(heap)] == sorted(best, key=best.get)
+
+
+def test_radix_heap_pops_monotone_keys_in_order():
+    # Dijkstra-like use: every push is at least the last popped key
+    rng = random.Random(3)
+    heap, pushed, popped = RadixHeap(), [], []
+    last = 0
+    for _ in range(3000):
+        if pushed and rng.random() < 0.4:
+            item = heap.pop()
+            popped.append(item)
+            last = item[0]
+            continue
+        item = (last + rng.choice((0, rng.uniform(0, 5), rng.uniform(0, 500))), len(pushed))
+        heap.push(item)
+        pushed.append(item)
+    popped.extend(drain(heap))
+    assert sorted(popped) == sorted(pushed)
+    keys = [int(priority * 1000) for priority, _ in popped]
+    assert keys == sorted(keys)
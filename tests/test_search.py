@@ -0,0 +1,132 @@
+import random
+
+import pytest
+
+from algorithms import INF, a_star_search, bidirectional_a_star, get_edge_costs
+from contraction import ch_search
+from landmarks import UNREACHABLE, dijkstra_all, load_or_build_landmarks
+from overlay import RoutingOverlay, crp_search
+from structures import IndexedMinHeap, MinHeap, RadixHeap
+
+MODES = ('car', 'walk')
+
+
+def dijkstra_costs(graph, mode):
+    """{(source id, target id): cost} for every ordered pair, from plain Dijkstra."""
+    costs = get_edge_costs(graph, mode)
+    table = {}
+    for s in range(len(graph.node_ids)):
+        dist = dijkstra_all(graph, s, costs)
+        for t, d in enumerate(dist):
+            table[(graph.node_ids[s], graph.node_ids[t])] = INF if d == UNREACHABLE else d
+    return table
+
+
+def path_cost(graph, path, mode):
+    """Cheapest cost of following path's nodes in order (parallel edges: the cheaper one)."""
+    costs = get_edge_costs(graph, mode)
+    total = 0
+    for a, b in zip(path, path[1:]):
+        u, v = graph.to_index(a), graph.to_index(b)
+        total += min(costs[e] for e in range(graph.csr_offsets[u], graph.csr_offsets[u + 1])
+                     if graph.csr_targets[e] == v)
+    return total
+
+
+def inconsistent_heuristic(graph, source, goal, mode):
+    """Admissible but not consistent: the exact time to goal on odd nodes, 0 on even ones."""
+    to_goal = dijkstra_all(graph, goal, get_edge_costs(graph, mode), reverse=True)
+    return lambda i: to_goal[i] if i % 2 else 0
+
+
+@pytest.fixture(scope='module')
+def pairs(graph):
+    rng = random.Random(3)
+    ids = list(graph.node_ids)
+    return [tuple(rng.sample(ids, 2)) for _ in range(40)]
+
+
+@pytest.fixture(scope='module')
+def small_overlay(graph):
+    """Several cells even on the 36-node fixture, so queries cross the overlay."""
+    graph.overlay = RoutingOverlay(graph, cell_size=8)
+    return graph.overlay
+
+
+def check_against_dijkstra(graph, pairs, search, mode, tolerance=1e-6):
+    reference = dijkstra_costs(graph, mode)
+    for s, t in pairs:
+        path, cost = search(graph, s, t, mode)[:2]
+        expected = reference[(s, t)]
+        if expected == INF:
+            assert path is None and cost == INF
+            continue
+        assert cost == pytest.approx(expected, abs=tolerance)
+        assert path[0] == s and path[-1] == t
+        assert path_cost(graph, path, mode) == pytest.approx(cost, abs=tolerance)
+
+
+@pytest.mark.parametrize('mode', MODES)
+@pytest.mark.parametrize('queue', (MinHeap, IndexedMinHeap))
+def test_a_star_matches_dijkstra(graph, pairs, mode, queue):
+    check_against_dijkstra(graph, pairs, lambda *args: a_star_search(*args, queue=queue), mode)
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_a_star_with_landmarks_matches_dijkstra(graph, pairs, mode):
+    graph.landmarks = load_or_build_landmarks(graph, count=4)
+    try:
+        check_against_dijkstra(graph, pairs, a_star_search, mode)
+    finally:
+        graph.landmarks = None
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_radix_heap_within_a_millisecond(graph, pairs, mode):
+    # RadixHeap rounds keys to whole milliseconds, so costs are within 1 ms per hop
+    check_against_dijkstra(graph, pairs, lambda *args: a_star_search(*args, queue=RadixHeap), mode,
+                           tolerance=0.001 * len(graph.node_ids))
+
+
+@pytest.mark.parametrize('mode', MODES)
+@pytest.mark.parametrize('queue', (MinHeap, IndexedMinHeap))
+def test_bidirectional_matches_dijkstra(graph, pairs, mode, queue):
+    check_against_dijkstra(graph, pairs, lambda *args: bidirectional_a_star(*args, queue=queue), mode)
+
+
+@pytest.mark.parametrize('mode', MODES)
+@pytest.mark.parametrize('queue', (MinHeap, IndexedMinHeap))
+def test_contraction_hierarchy_matches_dijkstra(graph, pairs, mode, queue):
+    check_against_dijkstra(graph, pairs, lambda *args: ch_search(*args, queue=queue), mode)
+
+
+@pytest.mark.parametrize('mode', MODES)
+@pytest.mark.parametrize('queue', (MinHeap, IndexedMinHeap))
+def test_overlay_matches_dijkstra(graph, pairs, small_overlay, mode, queue):
+    assert len(small_overlay.cells) > 1
+    check_against_dijkstra(graph, pairs, lambda *args: crp_search(*args, queue=queue), mode)
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_overlay_exact_with_inconsistent_heuristic(graph, pairs, small_overlay, mode):
+    def search(graph, s, t, mode):
+        path, cost = small_overlay.query(graph.to_index(s), graph.to_index(t), mode,
+                                         heuristic=inconsistent_heuristic)[:2]
+        return [graph.node_ids[i] for i in path] if path else None, cost
+    check_against_dijkstra(graph, pairs, search, mode)
+
+
+def test_searches_follow_rush_hour(graph, pairs, small_overlay):
+    graph.rush_hour_active = True
+    try:
+        for search in (a_star_search, bidirectional_a_star, ch_search, crp_search):
+            check_against_dijkstra(graph, pairs, search, 'car')
+    finally:
+        graph.rush_hour_active = False
+
+
+def test_contraction_hierarchy_counts_heap_operations(graph, pairs):
+    for s, t in pairs:
+        _, _, stats = ch_search(graph, s, t, 'car', return_stats=True)
+        # Every settled node was popped, plus the two initial pushes
+        assert stats['heap_operations'] >= stats['nodes_explored'] + 2
@@ -0,0 +1,81 @@
+import pytest
+
+from algorithms import METERS_PER_DEG_LAT, METERS_PER_DEG_LON, a_star_search, get_edge_costs
+from conftest import ORIGIN_LAT, ORIGIN_LON, load_graph, write_network
+
+# Roads 500 m apart so each test point has one obvious road
+L_ROAD, STRAIGHT, DIAGONAL = (1, 2), (3, 4), (5, 6)
+
+
+def north(metres):
+    return metres / METERS_PER_DEG_LAT
+
+
+def east(metres):
+    return metres / METERS_PER_DEG_LON
+
+
+@pytest.fixture(scope='module')
+def roads(tmp_path_factory):
+    """
+    An L-shaped road (100 m east, then 100 m north), a straight 200 m east-west road
+    and a 45 degree diagonal. Like the OSM export, both directions of a road share
+    one geometry string, here always written from the second node to the first.
+    """
+    places = {
+        1: (0, 0), 2: (100, 100),
+        3: (500, 0), 4: (500, 200),
+        5: (1000, 0), 6: (1100, 100),
+    }
+    nodes = {str(n): {'lat': ORIGIN_LAT + north(y), 'lon': ORIGIN_LON + east(x), 'elevation': 540}
+             for n, (y, x) in places.items()}
+    corner = (ORIGIN_LAT, ORIGIN_LON + east(100))
+
+    def point(n):
+        return f"{nodes[str(n)]['lon']} {nodes[str(n)]['lat']}"
+
+    geometries = {
+        L_ROAD: f"LINESTRING ({point(2)}, {corner[1]} {corner[0]}, {point(1)})",
+        STRAIGHT: f"LINESTRING ({point(4)}, {point(3)})",
+        DIAGONAL: f"LINESTRING ({point(6)}, {point(5)})",
+    }
+    edges = []
+    for (u, v), geometry in geometries.items():
+        length = 200 if (u, v) != DIAGONAL else 100 * 2 ** 0.5
+        for a, b in ((u, v), (v, u)):
+            edges.append({'u': str(a), 'v': str(b), 'weight': length, 'is_walkable': True,
+                          'is_drivable': True, 'highway': 'residential', 'geometry': geometry})
+    directory = str(tmp_path_factory.mktemp('roads'))
+    return load_graph(*write_network(directory, nodes, edges))
+
+
+def metres_from(graph, snap, node):
+    """Distance along the road from node to the snapped point."""
+    along = snap.fraction * graph.csr_weights[snap.edge]
+    return along if graph.node_ids[snap.source] == node else graph.csr_weights[snap.edge] - along
+
+
+def test_fraction_measured_in_metres(roads):
+    # The corner of the L is halfway along it, whichever leg is longer in degrees
+    snap = roads.snap_to_edge(ORIGIN_LAT, ORIGIN_LON + east(100))
+    assert metres_from(roads, snap, 1) == pytest.approx(100)
+
+
+def test_fraction_counts_from_edge_source(roads):
+    # 50 m east of node 3 and 10 m north of the road
+    snap = roads.snap_to_edge(ORIGIN_LAT + north(510), ORIGIN_LON + east(50))
+    assert metres_from(roads, snap, 3) == pytest.approx(50)
+    assert snap.dist_sq == pytest.approx(10 ** 2)
+
+
+def test_projection_is_perpendicular_in_metres(roads):
+    # Due east of node 5: the foot of the perpendicular is the diagonal's midpoint
+    snap = roads.snap_to_edge(ORIGIN_LAT + north(1000), ORIGIN_LON + east(100))
+    assert metres_from(roads, snap, 5) == pytest.approx(50 * 2 ** 0.5)
+
+
+def test_virtual_start_cost(roads):
+    snap = roads.snap_to_edge(ORIGIN_LAT + north(500), ORIGIN_LON + east(50))
+    costs = get_edge_costs(roads, 'car')
+    _, cost = a_star_search(roads, snap, 4, 'car')
+    assert cost == pytest.approx(costs[snap.edge] * 150 / 200)
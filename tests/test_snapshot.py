@@ -0,0 +1,60 @@
+import os
+
+from conftest import load_graph, make_network, write_network
+from graph_snapshot import read_snapshot, source_checksum, write_snapshot
+from structures import SNAPSHOT_FILE, CityGraph
+
+ARRAYS = ('node_ids', 'lat', 'lon', 'ele', 'csr_offsets', 'csr_targets',
+          'csr_weights', 'csr_flags', 'csr_highway')
+
+
+def assert_same_network(a, b):
+    for name in ARRAYS:
+        assert list(getattr(a, name)) == list(getattr(b, name)), name
+    assert a.highway_names == b.highway_names
+    assert a.drive_nodes == b.drive_nodes and a.walk_nodes == b.walk_nodes
+    for e in range(len(a.csr_targets)):
+        assert a.edge_geometry(e) == b.edge_geometry(e)
+
+
+def test_snapshot_round_trip(network_files, capsys):
+    from_json = load_graph(*network_files, snapshot_file=False)
+    first = load_graph(*network_files)
+    assert os.path.exists(os.path.join(os.path.dirname(network_files[0]), SNAPSHOT_FILE))
+    capsys.readouterr()
+
+    second = load_graph(*network_files)
+    assert 'Loaded compiled graph snapshot' in capsys.readouterr().out
+    mapped = load_graph(*network_files, backend='mmap')
+    for graph in (first, second, mapped):
+        assert_same_network(from_json, graph)
+    assert [p['name'] for p in second.pois] == [p['name'] for p in from_json.pois]
+    assert second.poi_nodes == from_json.poi_nodes
+
+
+def test_snapshot_rejects_other_checksum(network_files):
+    path = os.path.join(os.path.dirname(network_files[0]), 'test.snapshot')
+    sections = CityGraph._compile_json(*network_files[:2])
+    write_snapshot(path, b'a' * 32, sections)
+    assert read_snapshot(path, b'b' * 32) is None
+    loaded = read_snapshot(path, b'a' * 32)
+    assert {name: list(data) for name, data in loaded.items()} == {name: list(data) for name, data in sections.items()}
+
+
+def test_changed_source_invalidates_snapshot(network_files, capsys):
+    nodes_file, edges_file, _ = network_files
+    load_graph(*network_files)
+    before = source_checksum([nodes_file, edges_file])
+
+    nodes, edges = make_network()
+    for edge in edges:
+        edge['weight'] *= 2
+    write_network(os.path.dirname(nodes_file), nodes, edges)
+    assert source_checksum([nodes_file, edges_file]) != before
+    capsys.readouterr()
+
+    graph = load_graph(*network_files)
+    out = capsys.readouterr().out
+    assert 'Loaded compiled graph snapshot' not in out
+    assert 'Wrote graph snapshot' in out
+    assert sorted(graph.csr_weights) == sorted(edge['weight'] for edge in edges)
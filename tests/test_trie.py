@@ -0,0 +1,170 @@
+import random
+
+import pytest
+
+from nust_pois import get_all_pois
+from structures import Trie
+
+TYPE_PRIORITY = {'gate': 0, 'academic': 1, 'hostel': 2}
+
+
+class BaselineTrie:
+    """The original character-per-node trie, kept as the reference for the POI search index."""
+    class Node:
+        def __init__(self):
+            self.children = {}
+            self.is_end_of_word = False
+            self.poi_data = None
+
+    def __init__(self):
+        self.root = self.Node()
+        self.all_words = []
+
+    def insert(self, word, poi_data=None):
+        node = self.root
+        word_lower = word.lower()
+        self.all_words.append({'word': word_lower, 'data': poi_data})
+        for char in word_lower:
+            node = node.children.setdefault(char, self.Node())
+        node.is_end_of_word = True
+        node.poi_data = poi_data
+
+    def collect(self, prefix):
+        """Every word below prefix in depth-first order, None if no word has it."""
+        node = self.root
+        for char in prefix.lower():
+            if char not in node.children:
+                return None
+            node = node.children[char]
+        suggestions = []
+        stack = [(node, prefix.lower())]
+        while stack:
+            node, word = stack.pop()
+            if node.is_end_of_word:
+                suggestions.append({'name': word, 'data': node.poi_data})
+            stack.extend(reversed([(child, word + char) for char, child in node.children.items()]))
+        return suggestions
+
+    def search_prefix(self, prefix):
+        suggestions = self.collect(prefix)
+        return self.fuzzy_search(prefix) if suggestions is None else suggestions[:10]
+
+    def fuzzy_search(self, query, max_distance=2):
+        query = query.lower()
+        results = []
+        for item in self.all_words:
+            word = item['word']
+            if query in word:
+                results.append({'name': word, 'data': item['data'], 'score': 0})
+                continue
+            if len(query) >= 2:
+                dist = levenshtein(query, word[:min(len(query) + 1, len(word))])
+                if dist <= max_distance:
+                    results.append({'name': word, 'data': item['data'], 'score': dist})
+                    continue
+                for sub_word in word.split():
+                    if len(sub_word) >= 2:
+                        dist = levenshtein(query, sub_word[:len(query) + 1])
+                        if dist <= max_distance:
+                            results.append({'name': word, 'data': item['data'], 'score': dist})
+                            break
+        results.sort(key=lambda x: x['score'])
+        return results[:10]
+
+
+def levenshtein(s1, s2):
+    prev_row = list(range(len(s2) + 1))
+    for i, c1 in enumerate(s1):
+        curr_row = [i + 1]
+        for j, c2 in enumerate(s2):
+            curr_row.append(min(prev_row[j + 1] + 1, curr_row[j] + 1, prev_row[j] + (c1 != c2)))
+        prev_row = curr_row
+    return prev_row[-1]
+
+
+def typo(rng, word):
+    """word with one or two random edits."""
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    for _ in range(rng.randint(1, 2)):
+        i = rng.randrange(len(word) + 1)
+        edit = rng.choice(('insert', 'delete', 'replace'))
+        if edit == 'insert':
+            word = word[:i] + rng.choice(letters) + word[i:]
+        elif word:
+            i = min(i, len(word) - 1)
+            word = word[:i] + (rng.choice(letters) if edit == 'replace' else '') + word[i + 1:]
+    return word
+
+
+@pytest.fixture(scope='module')
+def pois():
+    # Words that share long prefixes exercise the radix edge splits
+    extra = ['Cafe', 'Cafeteria', 'Cafe Bistro', 'Cab Stand', 'C', 'Ca', 'Caf', 'Zeta', 'Zeta Block']
+    return get_all_pois() + [{'name': name, 'lat': 0, 'lon': 0, 'type': 'other'} for name in extra]
+
+
+def build(pois, trie):
+    for p in pois:
+        trie.insert(p['name'], p)
+    return trie
+
+
+def queries(pois, count=100):
+    """Every prefix of every name, then count typo'd prefixes and a few misses."""
+    rng = random.Random(5)
+    names = [p['name'].lower() for p in pois]
+    prefixes = {name[:i] for name in names for i in range(len(name) + 1)}
+    return sorted(prefixes) + typo_queries(rng, names, count)
+
+
+def typo_queries(rng, names, count):
+    typos = [typo(rng, rng.choice(names)[:rng.randint(2, 12)]) for _ in range(count)]
+    return typos + ['xq', 'zzz', 'h-12 nust', 'gatee', 'lib']
+
+
+def test_radix_trie_matches_baseline(pois):
+    trie, baseline = build(pois, Trie()), build(pois, BaselineTrie())
+    for query in queries(pois):
+        assert trie.search_prefix(query) == baseline.search_prefix(query), query
+
+
+def test_fuzzy_index_matches_baseline_scan(pois):
+    trie, baseline = build(pois, Trie()), build(pois, BaselineTrie())
+    rng = random.Random(9)
+    names = [p['name'].lower() for p in pois]
+    # Whole names with typos are longer than FuzzyIndex.KEY_LENGTH, so the index only sees a prefix
+    whole = [typo(rng, name) for name in rng.sample(names, 20)]
+    for query in typo_queries(rng, names, 60) + whole + rng.sample(names, 20):
+        for max_distance in (1, 2):
+            assert trie._fuzzy_search(query, max_distance) == baseline.fuzzy_search(query, max_distance), query
+
+
+@pytest.mark.parametrize('top_k', (1, 3, 10))
+def test_top_k_matches_sorted_baseline(pois, top_k):
+    def score(p):
+        return TYPE_PRIORITY.get(p['type'], len(TYPE_PRIORITY))
+
+    trie, baseline = build(pois, Trie(top_k=top_k, score=score)), build(pois, BaselineTrie())
+    for query in queries(pois, count=0):
+        expected = baseline.collect(query)
+        if expected is None:
+            continue
+        expected.sort(key=lambda s: score(s['data']))   # Stable: depth-first order breaks ties
+        assert trie.search_prefix(query) == expected[:top_k], query
+
+
+def test_flattened_trie_round_trip(pois):
+    trie = build(pois, Trie())
+    restored = Trie.from_sections(trie.to_sections(), trie.all_words)
+    for query in queries(pois, count=50):
+        assert restored.search_prefix(query) == trie.search_prefix(query), query
+
+
+def test_insert_after_lookup_reranks(pois):
+    trie, baseline = build(pois[:20], Trie()), build(pois[:20], BaselineTrie())
+    for query in queries(pois[:20], count=20):
+        trie.search_prefix(query)
+    build(pois[20:], trie)
+    build(pois[20:], baseline)
+    for query in queries(pois, count=50):
+        assert trie.search_prefix(query) == baseline.search_prefix(query), query
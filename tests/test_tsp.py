@@ -0,0 +1,50 @@
+import random
+from itertools import permutations
+
+import pytest
+
+from algorithms import INF, held_karp_tsp
+
+
+def route_cost(matrix, order):
+    stops = [0] + list(order)
+    return sum(matrix[a][b] for a, b in zip(stops, stops[1:]))
+
+
+def brute_force(matrix):
+    return min(route_cost(matrix, order) for order in permutations(range(1, len(matrix))))
+
+
+def random_matrix(rng, size, gaps=0.0):
+    return [[0 if a == b else (INF if rng.random() < gaps else rng.uniform(10, 600))
+             for b in range(size)] for a in range(size)]
+
+
+@pytest.mark.parametrize('stops', range(1, 8))
+def test_held_karp_matches_brute_force(stops):
+    rng = random.Random(stops)
+    for _ in range(5):
+        matrix = random_matrix(rng, stops + 1)
+        order, cost = held_karp_tsp(matrix)
+        assert sorted(order) == list(range(1, stops + 1))
+        assert cost == pytest.approx(brute_force(matrix))
+        assert route_cost(matrix, order) == pytest.approx(cost)
+
+
+def test_held_karp_with_unreachable_legs():
+    rng = random.Random(11)
+    for _ in range(20):
+        matrix = random_matrix(rng, 7, gaps=0.4)
+        expected = brute_force(matrix)
+        order, cost = held_karp_tsp(matrix)
+        if expected == INF:
+            assert order is None and cost == INF
+        else:
+            assert cost == pytest.approx(expected)
+            assert route_cost(matrix, order) == pytest.approx(cost)
+
+
+def test_held_karp_memory_limit():
+    matrix = random_matrix(random.Random(1), 8)
+    assert held_karp_tsp(matrix, memory_limit=1024) is None
+    assert held_karp_tsp([[0]]) == ([], 0)
@@ -0,0 +1,68 @@
+import pytest
+
+from algorithms import INF, get_edge_costs, get_k_shortest_paths
+from landmarks import dijkstra_all
+from conftest import node_id
+
+K = 6
+PAIRS = [
+    (node_id(0, 0), node_id(0, 1)),   # Parallel roads: the slower lane is a route of its own
+    (node_id(0, 0), node_id(5, 5)),
+    (node_id(5, 0), node_id(0, 5)),
+    (node_id(2, 5), node_id(2, 0)),   # Against the one-way arterial by car
+    (node_id(3, 2), node_id(4, 3)),
+    (node_id(1, 4), node_id(4, 1)),
+]
+
+
+def naive_k_shortest(graph, source, goal, mode, bound):
+    """
+    Costs of every loopless route (as an edge sequence) from source to goal costing
+    at most bound, by exhaustive depth-first search. Routes that cannot finish
+    within bound are cut using the exact remaining distance to goal.
+    """
+    costs = get_edge_costs(graph, mode)
+    to_goal = dijkstra_all(graph, goal, costs, reverse=True)
+    offsets, targets = graph.csr_offsets, graph.csr_targets
+    found = []
+
+    def extend(u, cost, visited):
+        if u == goal:
+            found.append(cost)
+            return
+        for e in range(offsets[u], offsets[u + 1]):
+            v = targets[e]
+            if costs[e] == INF or v in visited or cost + costs[e] + to_goal[v] > bound:
+                continue
+            visited.add(v)
+            extend(v, cost + costs[e], visited)
+            visited.remove(v)
+
+    extend(source, 0, {source})
+    return sorted(found)
+
+
+@pytest.mark.parametrize('mode', ('car', 'walk'))
+@pytest.mark.parametrize('pair', PAIRS)
+def test_yen_matches_enumeration(graph, pair, mode):
+    routes = get_k_shortest_paths(graph, pair[0], pair[1], k=K, mode=mode)
+    assert routes
+    yen_costs = [cost for _, cost in routes]
+    assert yen_costs == sorted(yen_costs)
+    for path, _ in routes:
+        assert path[0] == pair[0] and path[-1] == pair[1]
+        assert len(set(path)) == len(path)
+
+    naive = naive_k_shortest(graph, graph.to_index(pair[0]), graph.to_index(pair[1]), mode, yen_costs[-1] + 1e-6)
+    assert yen_costs == pytest.approx(naive[:K])
+
+
+def test_yen_tells_parallel_roads_apart(graph):
+    u, v = graph.to_index(node_id(0, 0)), graph.to_index(node_id(0, 1))
+    costs = get_edge_costs(graph, 'walk')
+    parallel = sorted(costs[e] for e in range(graph.csr_offsets[u], graph.csr_offsets[u + 1])
+                      if graph.csr_targets[e] == v)
+    routes = get_k_shortest_paths(graph, node_id(0, 0), node_id(0, 1), k=2, mode='walk')
+    assert len(parallel) == 2
+    assert [path for path, _ in routes] == [[node_id(0, 0), node_id(0, 1)]] * 2
+    assert [cost for _, cost in routes] == pytest.approx(parallel)